@@ -0,0 +1,93 @@
+"""
+Local load test for the PharmaTech HTTP query service.
+
+Starts a server in-process (or targets --url), then runs keep-alive client
+threads against a mix of queries and reports requests/sec and latency
+percentiles.
+
+    python examples/load_test.py --threads 8 --requests 2000
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from pharmatech.server import serve
+
+PATHS = [
+    "/medicines/paracetamol",
+    "/medicines/ibuprofen/pregnancy-safety",
+    "/search/condition?q=pain",
+    "/search/condition?q=fever",
+    "/search/category?q=anti",
+    "/search/side-effect?q=nausea",
+    "/search/form?q=syrup",
+    "/pregnancy-safe?category=B",
+    "/categories",
+]
+
+
+def run_client(host, port, requests, latencies, errors, conditional):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    etags = {}
+    for i in range(requests):
+        path = PATHS[i % len(PATHS)]
+        headers = {"If-None-Match": etags[path]} if conditional and path in etags else {}
+        start = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status not in (200, 304):
+            errors.append(response.status)
+        elif response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="server to test, default: start one in-process")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per thread")
+    parser.add_argument("--conditional", action="store_true",
+                        help="revalidate with If-None-Match after the first response")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        server = serve(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+
+    latencies, errors = [], []
+    clients = [threading.Thread(target=run_client,
+                                args=(host, port, args.requests, latencies, errors, args.conditional))
+               for _ in range(args.threads)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"requests:     {len(latencies)} ({len(errors)} errors)")
+    print(f"requests/sec: {len(latencies) / elapsed:.0f}")
+    print(f"latency p50:  {percentile(0.50):.2f} ms")
+    print(f"latency p99:  {percentile(0.99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
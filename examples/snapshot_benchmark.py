@@ -0,0 +1,91 @@
+"""
+Startup benchmark: loading a snapshot versus rebuilding the catalog.
+
+Measures what a freshly started worker pays to get a ready database, each
+sample in a new interpreter so nothing is warm, plus the steady-state cost of
+repeated loads and rebuilds in one process. With --copies the built-in
+catalog is replicated into a catalog file of that many times its size.
+
+    python examples/snapshot_benchmark.py --runs 20
+    python examples/snapshot_benchmark.py --copies 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from pharmatech.medicine_db import MedicineDatabase
+
+WORKER = """
+import sys, time
+start = time.perf_counter()
+from pharmatech.medicine_db import MedicineDatabase
+imported = time.perf_counter()
+catalog = sys.argv[3] or None
+if sys.argv[1] == "load":
+    MedicineDatabase.load_snapshot(sys.argv[2], catalog)
+else:
+    MedicineDatabase(catalog)
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def write_catalog(path, copies):
+    """Write the built-in catalog, replicated under numbered names, to a file."""
+    sections = MedicineDatabase._builtin_catalog()
+    medicines, categories = {}, {category: [] for category in sections["categories"]}
+    for copy in range(copies):
+        for name, info in sections["medicines"].items():
+            medicines[f"{name}_{copy}"] = info
+        for category, names in sections["categories"].items():
+            categories[category].extend(f"{name}_{copy}" for name in names)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({"medicines": medicines, "categories": categories}, handle)
+    return len(medicines)
+
+
+def fresh_process(mode, snapshot, catalog, runs):
+    imports, builds = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", WORKER, mode, snapshot, catalog or ""],
+                                check=True, capture_output=True, text=True).stdout
+        imported, built = map(float, output.split())
+        imports.append(imported)
+        builds.append(built)
+    return statistics.median(imports), statistics.median(builds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--copies", type=int, default=0,
+                        help="replicate the built-in catalog into a file this many times")
+    parser.add_argument("--runs", type=int, default=20, help="fresh processes per mode")
+    parser.add_argument("--repeat", type=int, default=200, help="in-process iterations")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = None
+        if args.copies:
+            catalog = os.path.join(directory, "catalog.json")
+            print(f"catalog: {write_catalog(catalog, args.copies)} medicines")
+        snapshot = os.path.join(directory, "catalog.snap")
+        MedicineDatabase(catalog).save_snapshot(snapshot)
+        print(f"snapshot: {os.path.getsize(snapshot)} bytes")
+
+        for mode in ("rebuild", "load"):
+            imported, built = fresh_process(mode, snapshot, catalog, args.runs)
+            print(f"fresh process, {mode:7}: import {imported * 1e3:6.2f} ms, "
+                  f"ready after {built * 1e3:7.3f} ms (median of {args.runs})")
+
+        for mode, call in (("rebuild", lambda: MedicineDatabase(catalog)),
+                           ("load", lambda: MedicineDatabase.load_snapshot(snapshot, catalog))):
+            best = min(timeit.repeat(call, number=args.repeat, repeat=5)) / args.repeat
+            print(f"in process,    {mode:7}: {best * 1e3:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Build hook baking the code fingerprint into wheels.
+
+Snapshots are tagged with a fingerprint of the code that built them. For an
+installed package the code cannot change, so the fingerprint is computed here
+once and shipped as pharmatech/_build.py instead of being derived from the
+source files in every process that loads a snapshot.
+"""
+import importlib.util
+import os
+import tempfile
+
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+
+
+def _load_snapshot_module(package: str):
+    # Loaded by path: the package itself is not importable during the build
+    spec = importlib.util.spec_from_file_location("_pharmatech_snapshot",
+                                                  os.path.join(package, "snapshot.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CustomBuildHook(BuildHookInterface):
+    def initialize(self, version, build_data):
+        # Editable installs run the working tree, which may still change;
+        # they fall back to fingerprinting the sources at runtime
+        if version == "editable":
+            return
+        package = os.path.join(self.root, "src", "pharmatech")
+        snapshot = _load_snapshot_module(package)
+        fingerprint = snapshot.source_fingerprint(*snapshot.package_sources(package))
+        fd, self._build_module = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(f'"""Generated at build time, do not edit."""\n'
+                         f'CODE_FINGERPRINT = "{fingerprint.hex()}"\n')
+        build_data["force_include"][self._build_module] = "pharmatech/" + snapshot.BUILD_MODULE
+
+    def finalize(self, version, build_data, artifact_path):
+        build_module = getattr(self, "_build_module", None)
+        if build_module is not None:
+            os.unlink(build_module)
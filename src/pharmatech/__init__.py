@@ -7,27 +7,51 @@ their uses, and safety information including pregnancy and breastfeeding conside
 
 __version__ = "0.1.0"
 
+import threading
+from typing import Optional
+
 from .medicine_db import MedicineDatabase
 
 class PharmaTech:
-    def __init__(self):
-        self._db = MedicineDatabase()
-
-    def find_medicines_for_condition(self, condition: str):
+    def __init__(self, database: Optional[MedicineDatabase] = None):
+        """
+        Create a PharmaTech facade.
+        
+        Args:
+            database: Database to query, e.g. one backed by an external catalog
+                file or loaded from a snapshot; defaults to the built-in catalog
+        """
+        self._db = database if database is not None else MedicineDatabase()
+
+    @property
+    def catalog_generation(self) -> int:
+        """Version number of the catalog, incremented on every change."""
+        return self._db.generation
+
+    @property
+    def catalog_version(self):
+        """The catalog (generation, change sequence number), read consistently."""
+        return self._db.version
+
+    def get_changes_since(self, seq: int):
+        """Get catalog changes after a change sequence number, for replicas."""
+        return self._db.changes_since(seq)
+
+    def find_medicines_for_condition(self, condition: str, explain: bool = False):
         """Find medicines that can treat a specific condition."""
-        return self._db.search_by_condition(condition)
+        return self._db.search_by_condition(condition, explain=explain)
 
-    def find_medicines_by_category(self, category: str):
+    def find_medicines_by_category(self, category: str, explain: bool = False):
         """Find medicines in a specific category."""
-        return self._db.search_by_category(category)
+        return self._db.search_by_category(category, explain=explain)
 
-    def find_medicines_by_side_effect(self, side_effect: str):
+    def find_medicines_by_side_effect(self, side_effect: str, explain: bool = False):
         """Find medicines that may cause a specific side effect."""
-        return self._db.search_by_side_effect(side_effect)
+        return self._db.search_by_side_effect(side_effect, explain=explain)
 
-    def find_medicines_by_form(self, form: str):
+    def find_medicines_by_form(self, form: str, explain: bool = False):
         """Find medicines available in a specific form (tablet, syrup, etc.)."""
-        return self._db.search_by_form(form)
+        return self._db.search_by_form(form, explain=explain)
 
     def get_medicine_details(self, generic_name: str):
         """Get detailed information about a medicine."""
@@ -41,6 +65,14 @@ class PharmaTech:
         """Get dosage information for a specific medicine."""
         return self._db.get_dosage_info(generic_name)
 
+    def get_structured_dosage(self, generic_name: str):
+        """Get the parsed adult dose range, interval and daily maximum of a medicine."""
+        return self._db.get_dosage_spec(generic_name)
+
+    def validate_doses(self, orders):
+        """Validate (generic_name, dose, doses_per_day) orders against dosage limits."""
+        return self._db.validate_doses(orders)
+
     def get_pregnancy_safety(self, generic_name: str):
         """Get pregnancy safety information for a specific medicine."""
         return self._db.get_pregnancy_safety(generic_name)
@@ -49,17 +81,38 @@ class PharmaTech:
         """Get breastfeeding safety information for a specific medicine."""
         return self._db.get_lactation_safety(generic_name)
 
-    def find_pregnancy_safe_medicines(self, category: str = "A"):
+    def find_pregnancy_safe_medicines(self, category: str = "A", explain: bool = False):
         """Find medicines that are safe during pregnancy by category."""
-        return self._db.search_safe_in_pregnancy(category)
+        return self._db.search_safe_in_pregnancy(category, explain=explain)
 
-    def find_breastfeeding_safe_medicines(self, category: str = "safe"):
+    def find_breastfeeding_safe_medicines(self, category: str = "safe", explain: bool = False):
         """Find medicines that are safe during breastfeeding by category."""
-        return self._db.search_safe_in_lactation(category)
+        return self._db.search_safe_in_lactation(category, explain=explain)
+
+    def get_medicine_categories(self, generic_name: str):
+        """Get all categories a medicine belongs to, including parent categories."""
+        return self._db.get_medicine_categories(generic_name)
+
+    def explain_query(self, query: str, *args):
+        """Run a find_* search by name and return its query plan instead of its results."""
+        if not query.startswith("find_") or not hasattr(self, query):
+            raise ValueError(f"cannot explain {query!r}")
+        return getattr(self, query)(*args, explain=True)[1]
 
     def get_available_categories(self):
         """Get a list of all available medicine categories."""
         return self._db.get_all_categories()
 
-# Create a default instance for easier usage
-pharma = PharmaTech()
+_pharma_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    # The default instance for easier usage, ``from pharmatech import pharma``.
+    # Created on first use: building it at import would make every process
+    # that imports the package, e.g. to load a snapshot, pay for a rebuild.
+    if name == "pharma":
+        with _pharma_lock:
+            if "pharma" not in globals():
+                globals()["pharma"] = PharmaTech()
+        return globals()["pharma"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
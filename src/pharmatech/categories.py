@@ -0,0 +1,107 @@
+"""
+Indexed medicine categories.
+
+Categories form a hierarchy (e.g. "antacids" is a subcategory of "stomach").
+CategoryIndex precomputes the transitive closure in both directions, so a
+category's members include those of its subcategories and a medicine's
+categories include the ancestors of the categories it is listed in.
+"""
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Bound on remembered query -> matching categories resolutions
+_RESOLVE_CACHE_SIZE = 1024
+
+
+def _unique(items: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(items))
+
+
+class CategoryIndex:
+    """Forward and reverse category indexes with precomputed closure."""
+
+    def __init__(self, categories: Dict[str, List[str]], parents: Dict[str, List[str]]):
+        """
+        Build the index.
+
+        Args:
+            categories: Category name -> generic names listed directly in it
+            parents: Category name -> names of its parent categories
+        """
+        self.names: Tuple[str, ...] = tuple(categories)
+        self.ancestors: Dict[str, Tuple[str, ...]] = {
+            category: self._ancestors(category, parents) for category in categories
+        }
+
+        children: Dict[str, List[str]] = {category: [] for category in categories}
+        for category, category_ancestors in self.ancestors.items():
+            for ancestor in category_ancestors:
+                children.setdefault(ancestor, []).append(category)
+
+        # Forward index: members of a category and all of its subcategories
+        self.members: Dict[str, Tuple[str, ...]] = {
+            category: _unique(
+                name
+                for member_category in (category, *children[category])
+                for name in categories.get(member_category, ())
+            )
+            for category in categories
+        }
+
+        # Reverse index: a medicine's categories and all of their ancestors
+        reverse: Dict[str, List[str]] = {}
+        for category, names in categories.items():
+            for name in names:
+                reverse.setdefault(name, []).extend((category, *self.ancestors[category]))
+        self.medicine_categories: Dict[str, Tuple[str, ...]] = {
+            name: _unique(found) for name, found in reverse.items()
+        }
+        self._resolved: Dict[str, Tuple[str, ...]] = {}
+
+    def __getstate__(self) -> Dict:
+        # Resolved queries are a cache, not part of a snapshot
+        state = self.__dict__.copy()
+        state["_resolved"] = {}
+        return state
+
+    @staticmethod
+    def _ancestors(category: str, parents: Dict[str, List[str]]) -> Tuple[str, ...]:
+        found: List[str] = []
+        seen: Set[str] = {category}
+        pending = list(parents.get(category, ()))
+        while pending:
+            parent = pending.pop(0)
+            if parent in seen:
+                continue
+            seen.add(parent)
+            found.append(parent)
+            pending.extend(parents.get(parent, ()))
+        return tuple(found)
+
+    def resolve(self, query: str) -> Tuple[str, ...]:
+        """Return the categories whose name contains a lowercase query."""
+        matches = self._resolved.get(query)
+        if matches is None:
+            matches = tuple(name for name in self.names if query in name.lower())
+            if len(self._resolved) >= _RESOLVE_CACHE_SIZE:
+                self._resolved.clear()
+            self._resolved[query] = matches
+        return matches
+
+    def search(self, query: str) -> List[Tuple[str, str]]:
+        """
+        Find the medicines in every category matching a lowercase query.
+
+        Returns:
+            (generic_name, category) pairs without duplicate medicines, each
+            paired with the first matching category that contains it
+        """
+        found: Dict[str, str] = {}
+        for category in self.resolve(query):
+            for name in self.members[category]:
+                if name not in found:
+                    found[name] = category
+        return list(found.items())
+
+    def categories_of(self, generic_name: str) -> Tuple[str, ...]:
+        """Return all categories a medicine belongs to, including ancestors."""
+        return self.medicine_categories.get(generic_name, ())
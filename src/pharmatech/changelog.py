@@ -0,0 +1,73 @@
+"""
+Append-only change log of catalog mutations.
+
+Every mutation of a MedicineDatabase is recorded as a Change with a sequence
+number. Subscribers, in this process or in replicas elsewhere, replay the
+changes after the last sequence number they have seen instead of reloading
+the whole catalog.
+"""
+import threading
+from typing import Any, Iterable, List, NamedTuple, Optional
+
+# Change operations
+PUT = "put"          # insert or replace a record; record holds its own fields
+DELETE = "delete"    # remove a record
+SECTIONS = "sections"  # replace non-record sections; record holds them
+
+
+class Change(NamedTuple):
+    """One recorded mutation."""
+    seq: int
+    op: str
+    generic_name: Optional[str]
+    record: Any
+
+
+class ChangeLogTruncated(Exception):
+    """Raised when changes that were asked for are no longer retained."""
+
+
+class ChangeLog:
+    """
+    In-memory change log retaining the most recent changes.
+
+    Args:
+        max_entries: Number of changes retained for replay
+        start_seq: Sequence number of the state the log starts from
+    """
+
+    def __init__(self, max_entries: int = 100_000, start_seq: int = 0):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: List[Change] = []
+        self._first_seq = start_seq + 1
+        self.last_seq = start_seq
+
+    def append(self, changes: Iterable[Change]) -> None:
+        """Append changes, which must continue the sequence without gaps."""
+        with self._lock:
+            for change in changes:
+                if change.seq != self.last_seq + 1:
+                    raise ValueError(f"change {change.seq} does not follow {self.last_seq}")
+                self._entries.append(change)
+                self.last_seq = change.seq
+            # Trim in bulk so appends stay amortized O(1)
+            if len(self._entries) > 2 * self.max_entries:
+                drop = len(self._entries) - self.max_entries
+                del self._entries[:drop]
+                self._first_seq += drop
+
+    def since(self, seq: int) -> List[Change]:
+        """
+        Return the changes after a sequence number.
+
+        Raises:
+            ChangeLogTruncated: If some of those changes were already dropped
+        """
+        with self._lock:
+            if seq >= self.last_seq:
+                return []
+            if seq + 1 < self._first_seq:
+                raise ChangeLogTruncated(
+                    f"changes after {seq} are no longer retained, oldest is {self._first_seq}")
+            return self._entries[seq + 1 - self._first_seq:]
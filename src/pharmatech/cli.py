@@ -0,0 +1,230 @@
+"""
+Command line interface for PharmaTech.
+
+``pharmatech batch`` answers JSON Lines queries, one object per line::
+
+    {"id": 1, "query": "condition", "term": "fever"}
+    {"id": 2, "query": "pregnancy_safety", "term": "ibuprofen"}
+    {"id": 3, "query": "validate_doses", "orders": [["paracetamol", 500, 4]]}
+
+and writes one JSON line per query, ``{"id": ..., "result": ...}`` or
+``{"id": ..., "error": ...}``. Input is read and answered in chunks spread
+over a process pool, with a bounded number of chunks in flight, so memory use
+does not grow with the input size.
+
+``pharmatech serve`` runs the HTTP query service, see pharmatech.server.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from . import PharmaTech
+from .medicine_db import MedicineDatabase
+from .storage import TieredStorage
+
+# Query names accepted in batch input and the PharmaTech call they map to
+QUERIES: Dict[str, Callable[[PharmaTech, Dict], object]] = {
+    "condition": lambda p, q: p.find_medicines_for_condition(q["term"]),
+    "category": lambda p, q: p.find_medicines_by_category(q["term"]),
+    "side_effect": lambda p, q: p.find_medicines_by_side_effect(q["term"]),
+    "form": lambda p, q: p.find_medicines_by_form(q["term"]),
+    "details": lambda p, q: p.get_medicine_details(q["term"]),
+    "medicine_categories": lambda p, q: p.get_medicine_categories(q["term"]),
+    "contraindications": lambda p, q: p.get_medicine_contraindications(q["term"]),
+    "dosage": lambda p, q: p.get_medicine_dosage(q["term"]),
+    "structured_dosage": lambda p, q: p.get_structured_dosage(q["term"]),
+    "pregnancy_safety": lambda p, q: p.get_pregnancy_safety(q["term"]),
+    "lactation_safety": lambda p, q: p.get_lactation_safety(q["term"]),
+    "pregnancy_safe": lambda p, q: p.find_pregnancy_safe_medicines(q.get("term", "A")),
+    "breastfeeding_safe": lambda p, q: p.find_breastfeeding_safe_medicines(q.get("term", "safe")),
+    "categories": lambda p, q: p.get_available_categories(),
+    "validate_doses": lambda p, q: p.validate_doses(q["orders"]),
+}
+
+# The PharmaTech instance of the current (worker) process
+_pharma: Optional[PharmaTech] = None
+
+
+def _load(catalog: Optional[str], snapshot: Optional[str],
+          cold_cache_bytes: Optional[int] = None) -> PharmaTech:
+    tiered = TieredStorage(cache_bytes=cold_cache_bytes) if cold_cache_bytes else None
+    if snapshot:
+        return PharmaTech(MedicineDatabase.load_snapshot(snapshot, catalog, tiered_storage=tiered))
+    return PharmaTech(MedicineDatabase(catalog, tiered_storage=tiered))
+
+
+def _init_worker(catalog: Optional[str], snapshot: Optional[str],
+                 cold_cache_bytes: Optional[int]) -> None:
+    global _pharma
+    _pharma = _load(catalog, snapshot, cold_cache_bytes)
+
+
+def answer(pharma: PharmaTech, line: str) -> str:
+    """
+    Answer one JSON Lines query.
+
+    Args:
+        pharma: PharmaTech instance to query
+        line: One line of batch input
+
+    Returns:
+        The JSON output line, without a trailing newline
+    """
+    query_id = None
+    try:
+        query = json.loads(line)
+        if not isinstance(query, dict):
+            raise ValueError("query must be a JSON object")
+        query_id = query.get("id")
+        name = query.get("query")
+        if name not in QUERIES:
+            raise ValueError(f"unknown query {name!r}")
+        result = QUERIES[name](pharma, query)
+    except KeyError as exc:
+        return json.dumps({"id": query_id, "error": f"missing field {exc.args[0]!r}"})
+    except (TypeError, ValueError, AttributeError) as exc:
+        return json.dumps({"id": query_id, "error": str(exc)})
+    return json.dumps({"id": query_id, "result": result}, ensure_ascii=False)
+
+
+def _answer_chunk(lines: List[str]) -> List[str]:
+    return [answer(_pharma, line) for line in lines]
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    lines = (line for line in lines if line.strip())
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(lines: Iterable[str], out: TextIO, workers: int = 1,
+              catalog: Optional[str] = None, snapshot: Optional[str] = None,
+              chunk_size: int = 256, ordered: bool = True,
+              cold_cache_bytes: Optional[int] = None) -> int:
+    """
+    Answer a stream of JSON Lines queries.
+
+    Args:
+        lines: Input lines
+        out: Stream the output lines are written to
+        workers: Worker processes; 1 answers queries in this process
+        catalog: Optional catalog file to load instead of the built-in one
+        snapshot: Optional snapshot file to load the catalog from
+        chunk_size: Queries sent to a worker at a time
+        ordered: Write results in input order; otherwise as chunks complete
+        cold_cache_bytes: If given, load the catalog in tiered storage mode
+            with this many bytes of cached text fields per process
+
+    Returns:
+        Number of queries answered
+    """
+    count = 0
+    if workers <= 1:
+        pharma = _load(catalog, snapshot, cold_cache_bytes)
+        for chunk in _chunks(lines, chunk_size):
+            for line in chunk:
+                out.write(answer(pharma, line) + "\n")
+            count += len(chunk)
+        return count
+
+    max_in_flight = workers * 2
+    with Pool(workers, initializer=_init_worker, initargs=(catalog, snapshot, cold_cache_bytes)) as pool:
+        in_flight = deque()
+
+        def drain(limit: int) -> None:
+            nonlocal count
+            while len(in_flight) > limit:
+                if not ordered:
+                    ready = next((job for job in in_flight if job.ready()), None)
+                    if ready is not None:
+                        in_flight.remove(ready)
+                        job = ready
+                    else:
+                        job = in_flight.popleft()
+                else:
+                    job = in_flight.popleft()
+                results = job.get()
+                out.write("\n".join(results) + "\n")
+                count += len(results)
+
+        for chunk in _chunks(lines, chunk_size):
+            in_flight.append(pool.apply_async(_answer_chunk, (chunk,)))
+            drain(max_in_flight - 1)
+        drain(0)
+    return count
+
+
+def _batch(args: argparse.Namespace) -> int:
+    source = open(args.input, "r", encoding="utf-8") if args.input != "-" else sys.stdin
+    start = time.perf_counter()
+    try:
+        count = run_batch(source, sys.stdout, workers=args.workers, catalog=args.catalog,
+                          snapshot=args.snapshot, chunk_size=args.chunk_size,
+                          ordered=not args.unordered, cold_cache_bytes=args.cold_cache_bytes)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        rate = count / elapsed if elapsed else 0.0
+        print(f"{count} queries in {elapsed:.2f} s ({rate:.0f} queries/s, "
+              f"{args.workers} workers)", file=sys.stderr)
+    return 0
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from . import server
+    argv = ["--host", args.host, "--port", str(args.port)]
+    if args.catalog:
+        argv += ["--catalog", args.catalog]
+    if args.snapshot:
+        argv += ["--snapshot", args.snapshot]
+    if args.poll_interval:
+        argv += ["--poll-interval", str(args.poll_interval)]
+    if args.cold_cache_bytes:
+        argv += ["--cold-cache-bytes", str(args.cold_cache_bytes)]
+    server.main(argv)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="pharmatech", description="PharmaTech medicine catalog tools.")
+    parser.add_argument("--catalog", help="JSON catalog file to use instead of the built-in one")
+    parser.add_argument("--snapshot", help="snapshot file to load the catalog from")
+    parser.add_argument("--cold-cache-bytes", type=int,
+                        help="keep bulky text fields on disk behind a cache of this many bytes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="answer JSON Lines queries")
+    batch.add_argument("input", nargs="?", default="-", help="query file, default stdin")
+    batch.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                       help="worker processes (default: CPU count)")
+    batch.add_argument("--chunk-size", type=int, default=256, help="queries per work unit")
+    batch.add_argument("--unordered", action="store_true",
+                       help="write results as they complete instead of in input order")
+    batch.add_argument("-q", "--quiet", action="store_true", help="don't report throughput")
+    batch.set_defaults(func=_batch)
+
+    serve = commands.add_parser("serve", help="run the HTTP query service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--poll-interval", type=float,
+                       help="reload the catalog file this many seconds after it changes")
+    serve.set_defaults(func=_serve)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Structured dosage data parsed from free-text dosage strings.
+
+Dosage strings such as "500-1000 mg every 4-6 hours as needed (max 4000
+mg/day)" are parsed once, when a catalog is built, into DosageSpec tuples so
+that dose checks are plain numeric comparisons.
+"""
+import math
+import re
+from typing import Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+# Results of validate_doses()
+DOSE_OK = "ok"
+DOSE_TOO_LOW = "dose_too_low"
+DOSE_TOO_HIGH = "dose_too_high"
+DOSE_TOO_FREQUENT = "too_frequent"
+DAILY_MAX_EXCEEDED = "daily_max_exceeded"
+UNKNOWN_MEDICINE = "unknown_medicine"
+NO_STRUCTURED_DOSAGE = "no_structured_dosage"
+INVALID_ORDER = "invalid_order"
+
+# Conversion factors to the unit doses are compared in
+_UNITS = {
+    "mcg": ("mg", 0.001),
+    "µg": ("mg", 0.001),
+    "mg": ("mg", 1.0),
+    "g": ("mg", 1000.0),
+    "ml": ("ml", 1.0),
+    "unit": ("units", 1.0),
+    "units": ("units", 1.0),
+    "iu": ("units", 1.0),
+}
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_UNIT = r"(mcg|µg|mg|g|ml|units?|iu)\b"
+_DOSE_RE = re.compile(_NUMBER + r"(?:\s*(?:-|to)\s*" + _NUMBER + r")?\s*" + _UNIT, re.IGNORECASE)
+_EVERY_RE = re.compile(r"every\s+" + _NUMBER + r"(?:\s*(?:-|to)\s*" + _NUMBER + r")?\s*(hours?|hrs?|h)\b",
+                       re.IGNORECASE)
+_TIMES_DAILY_RE = re.compile(r"\b(once|twice|two|three|four|\d+)\s*(?:times\s*)?(?:daily|a day|per day)\b",
+                             re.IGNORECASE)
+_MAX_DAILY_RE = re.compile(r"max(?:imum)?\.?\s*" + _NUMBER + r"\s*" + _UNIT + r"\s*(?:/|per)\s*(?:day|24\s*h)",
+                           re.IGNORECASE)
+# Doses scaled by body weight or surface area, e.g. "10-15 mg/kg"
+_PER_BODY_RE = re.compile(r"\s*(?:/|per)\s*(?:kg|m2|m²)", re.IGNORECASE)
+_TIMES = {"once": 1, "twice": 2, "two": 2, "three": 3, "four": 4}
+
+
+class DosageSpec(NamedTuple):
+    """Parsed adult dosage of a medicine."""
+    min_dose: float
+    max_dose: float
+    unit: str
+    min_interval_hours: Optional[float]
+    max_interval_hours: Optional[float]
+    max_daily_dose: Optional[float]
+    max_doses_per_day: Optional[float]
+    text: str
+
+
+def _normalize(value: str, unit: str) -> Tuple[float, str]:
+    base, factor = _UNITS[unit.lower()]
+    return float(value) * factor, base
+
+
+def parse_dosage(text: str) -> Optional[DosageSpec]:
+    """
+    Parse a free-text dosage string.
+
+    Args:
+        text: Dosage text, e.g. "500-1000 mg every 4-6 hours (max 4000 mg/day)"
+
+    Returns:
+        DosageSpec, or None if the text does not state an absolute dose (doses
+        per kg of body weight or m² of body surface are not parsed)
+    """
+    if not isinstance(text, str):
+        return None
+    dose = _DOSE_RE.search(text)
+    if dose is None or _PER_BODY_RE.match(text, dose.end()):
+        return None
+    min_dose, unit = _normalize(dose.group(1), dose.group(3))
+    max_dose = _normalize(dose.group(2), dose.group(3))[0] if dose.group(2) else min_dose
+
+    min_interval = max_interval = None
+    every = _EVERY_RE.search(text)
+    if every:
+        min_interval = float(every.group(1))
+        max_interval = float(every.group(2)) if every.group(2) else min_interval
+    else:
+        times = _TIMES_DAILY_RE.search(text)
+        if times:
+            count = times.group(1).lower()
+            count = _TIMES[count] if count in _TIMES else int(count)
+            if count > 0:
+                min_interval = max_interval = 24.0 / count
+
+    max_daily = None
+    limit = _MAX_DAILY_RE.search(text)
+    if limit:
+        value, limit_unit = _normalize(limit.group(1), limit.group(2))
+        if limit_unit == unit:
+            max_daily = value
+
+    max_doses_per_day = 24.0 / min_interval if min_interval else None
+    return DosageSpec(min_dose, max_dose, unit, min_interval, max_interval,
+                      max_daily, max_doses_per_day, text)
+
+
+def validate_doses(specs: Mapping[str, DosageSpec], known: Iterable[str],
+                   orders: Iterable[Tuple[str, float, float]]) -> List[str]:
+    """
+    Validate a batch of orders against parsed dosage specs.
+
+    Args:
+        specs: Parsed specs keyed by lowercase generic name
+        known: Container of all known generic names
+        orders: (generic_name, dose, doses_per_day) tuples, with the dose in
+            the spec's unit (mg for mass units)
+
+    Returns:
+        One result constant per order, in order; INVALID_ORDER for a dose or
+        frequency that is not a finite positive number
+    """
+    results = []
+    append = results.append
+    get_spec = specs.get
+    isfinite = math.isfinite
+    for generic_name, dose, frequency in orders:
+        # NaN compares false against every limit, so it must be caught first
+        if not (isfinite(dose) and isfinite(frequency)) or dose <= 0 or frequency <= 0:
+            append(INVALID_ORDER)
+            continue
+        spec = get_spec(generic_name)
+        if spec is None:
+            name = generic_name.lower()
+            spec = get_spec(name)
+            if spec is None:
+                append(NO_STRUCTURED_DOSAGE if name in known else UNKNOWN_MEDICINE)
+                continue
+        if dose > spec.max_dose:
+            append(DOSE_TOO_HIGH)
+        elif dose < spec.min_dose:
+            append(DOSE_TOO_LOW)
+        elif spec.max_doses_per_day is not None and frequency > spec.max_doses_per_day:
+            append(DOSE_TOO_FREQUENT)
+        elif spec.max_daily_dose is not None and dose * frequency > spec.max_daily_dose:
+            append(DAILY_MAX_EXCEEDED)
+        else:
+            append(DOSE_OK)
+    return results
@@ -0,0 +1,88 @@
+"""
+Query explain plans.
+
+Search methods record what they do in a QueryPlan: the expanded search terms,
+the access path taken, how many candidates were examined against how many
+were returned, and the time spent in each stage. Without explain=True they
+get NO_PLAN, which records nothing.
+"""
+import time
+from typing import Any, Dict, List
+
+
+class _Stage:
+    __slots__ = ("_plan", "_name", "_start", "details")
+
+    def __init__(self, plan: "QueryPlan", name: str):
+        self._plan = plan
+        self._name = name
+        self.details: Dict[str, Any] = {}
+
+    def __enter__(self) -> Dict[str, Any]:
+        self._start = time.perf_counter()
+        return self.details
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self._start
+        self._plan.stages.append({"name": self._name, "seconds": seconds, **self.details})
+
+
+class QueryPlan:
+    """Explain plan of one search."""
+
+    def __init__(self, query: str, argument: Any, generation: int):
+        self._start = time.perf_counter()
+        self.info: Dict[str, Any] = {
+            "query": query,
+            "argument": argument,
+            "generation": generation,
+        }
+        self.stages: List[Dict[str, Any]] = []
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.info[key] = value
+
+    def stage(self, name: str) -> _Stage:
+        """Time a stage; the returned dict collects details about it."""
+        return _Stage(self, name)
+
+    def finish(self, returned: int) -> Dict[str, Any]:
+        """Return the plan as a dictionary."""
+        return {
+            **self.info,
+            "returned": returned,
+            "stages": self.stages,
+            "total_seconds": time.perf_counter() - self._start,
+        }
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> Dict[str, Any]:
+        return {}
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class _NullPlan:
+    """Plan used when a search is not explained; records nothing."""
+
+    __slots__ = ()
+    _stage = _NullStage()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        pass
+
+    def stage(self, name: str) -> _NullStage:
+        return self._stage
+
+
+NO_PLAN = _NullPlan()
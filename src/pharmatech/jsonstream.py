@@ -0,0 +1,121 @@
+"""
+Incremental reading of large JSON objects.
+
+json.load() holds a whole document, and everything decoded from it, in memory
+at once. A JsonStream instead walks an object member by member, decoding one
+value at a time from a bounded buffer, so a catalog file can be processed
+entry by entry whatever its size.
+"""
+import json
+import re
+from typing import Any, Callable, Iterator
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JsonStream:
+    """
+    Reader of JSON text supplied in chunks.
+
+    Args:
+        read: Returns up to the given number of characters of text, or ""
+            at the end
+        chunk_size: Characters to read at a time
+    """
+
+    def __init__(self, read: Callable[[int], str], chunk_size: int = 1 << 16):
+        self._read = read
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: int = 0) -> bool:
+        """Append the next chunk to the buffer, dropping what was consumed."""
+        if self._eof:
+            return False
+        chunk = self._read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the end."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} but found {found or 'end of input'!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """
+        Decode the next complete JSON value.
+
+        Raises:
+            ValueError: If the input is not valid JSON
+        """
+        self.peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read on, keeping the partial one, in
+                # growing chunks so a large value is not decoded many times
+                if self._fill(size):
+                    size *= 2
+                    continue
+                raise
+            # A number may go on in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """
+        Walk the object starting here, yielding the name of each member.
+
+        After each name the caller must consume the member's value, with
+        value() or with members() for an object.
+
+        Raises:
+            ValueError: If the input is not a valid JSON object
+        """
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name = self.value()
+            if not isinstance(name, str):
+                raise ValueError(f"expected a member name but found {name!r}")
+            self._expect(":")
+            yield name
+            separator = self.peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"expected ',' or '}}' but found {separator or 'end of input'!r}")
+
+    def end(self) -> None:
+        """
+        Check that nothing but whitespace is left.
+
+        Raises:
+            ValueError: If more data follows
+        """
+        if self.peek():
+            raise ValueError("extra data after the JSON document")
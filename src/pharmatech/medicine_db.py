@@ -1,12 +1,513 @@
 """
 Database module for medicine information storage and retrieval.
 """
-from typing import Dict, List, Optional
+import codecs
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from . import dosage as _dosage
+from .categories import CategoryIndex
+from .changelog import DELETE, PUT, SECTIONS, Change, ChangeLog
+from .dosage import DosageSpec, parse_dosage
+from .explain import NO_PLAN, QueryPlan
+from .jsonstream import JsonStream
+from .persistent import PersistentMap
+from .snapshot import (SnapshotError, atomic_write, file_digest, package_sources,
+                       read_snapshot, source_fingerprint, write_snapshot)
+from .storage import BlockRef, BlockStore, RecordCache, TieredStorage, value_size
+
+try:
+    # Written into wheels by the build hook (hatch_build.py)
+    from ._build import CODE_FINGERPRINT
+except ImportError:
+    CODE_FINGERPRINT = None
+
+# Sections of a catalog, in the order they are written to catalog files
+_CATALOG_SECTIONS = (
+    "pregnancy_categories",
+    "lactation_categories",
+    "condition_aliases",
+    "categories",
+    "category_parents",
+    "medicines",
+)
+
+_fingerprint: Optional[bytes] = None
+
+
+def _freeze(value: Any) -> Any:
+    """Return an immutable copy of a JSON-like value (lists become tuples)."""
+    # Concrete type checks: isinstance() against the typing/abc classes is
+    # far slower and these helpers run on every record read
+    kind = type(value)
+    if kind is list or kind is tuple:
+        return tuple(_freeze(item) for item in value)
+    if kind is dict or kind is MappingProxyType:
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Return a fresh mutable copy of a value frozen by _freeze()."""
+    kind = type(value)
+    if kind is tuple or kind is list:
+        for item in value:
+            if type(item) is not str:
+                return [_thaw(item) for item in value]
+        # Most record lists hold strings only, which list() copies in C
+        return list(value)
+    if kind is MappingProxyType or kind is dict:
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+# Shared defaults layer for fields a record does not set itself. Records only
+# store their own fields; defaults are merged in, as fresh copies, on read.
+_DEFAULT_INFO: Mapping[str, Any] = _freeze({
+    "dosage": {
+        "adult": "Consult physician for proper dosing",
+        "child": "Consult physician for proper dosing",
+        "form": ["tablet"]
+    },
+    "contraindications": [
+        "Known hypersensitivity",
+        "Consult physician for complete list"
+    ],
+    "side_effects": [
+        "Consult physician or package insert for complete list"
+    ],
+    "precautions": [
+        "Consult physician before use",
+        "Follow prescribed dosage carefully"
+    ],
+    "pregnancy_category": "C",
+    "pregnancy_safety": "Insufficient data available, use only if benefit outweighs risk",
+    "lactation_category": "caution",
+    "lactation_safety": "Limited data available, consult healthcare provider"
+})
+
+
+def _copier(value: Any) -> Optional[Callable[[], Any]]:
+    """
+    Return a function making fresh mutable copies of a frozen value.
+    
+    Returns None for immutable values, which can be shared as they are.
+    """
+    kind = type(value)
+    if kind is tuple:
+        if all(_copier(item) is None for item in value):
+            return functools.partial(list, value)
+        return functools.partial(_thaw, value)
+    if kind is MappingProxyType:
+        # Shallow-copy a mutable template, then replace its mutable values
+        template = _thaw(value)
+        nested = tuple((key, _copier(item)) for key, item in value.items()
+                       if _copier(item) is not None)
+
+        def copy_mapping():
+            fresh = template.copy()
+            for key, copy in nested:
+                fresh[key] = copy()
+            return fresh
+        return copy_mapping
+    return None
+
+
+# (field, default, copier) for every default, so merging a record's defaulted
+# fields only copies what is mutable
+_DEFAULT_COPIES: Tuple[Tuple[str, Any, Optional[Callable[[], Any]]], ...] = tuple(
+    (key, value, _copier(value)) for key, value in _DEFAULT_INFO.items()
+)
+# Mutable form of the defaults, for comparing records against them
+_DEFAULT_VALUES: Dict[str, Any] = _thaw(_DEFAULT_INFO)
+
+# Record fields checked when reading a catalog file (besides "dosage")
+_TEXT_LIST_FIELDS = ("uses", "conditions", "side_effects", "contraindications", "precautions")
+_TEXT_FIELDS = ("description", "pregnancy_category", "pregnancy_safety",
+                "lactation_category", "lactation_safety")
+# Catalog sections mapping names to lists of strings
+_TEXT_LIST_SECTIONS = ("condition_aliases", "categories", "category_parents")
+# Fields every stored record has (catalog files default them)
+_REQUIRED_FIELDS = ("uses", "conditions", "description")
+
+# Bulky text fields kept in the block store in tiered storage mode. Side
+# effects stay in memory because search_by_side_effect scans them.
+_COLD_FIELDS = ("description", "pregnancy_safety", "lactation_safety", "precautions")
+_NO_FIELDS: Mapping[str, Any] = MappingProxyType({})
+
+
+def _is_text_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _split_cold_fields(info: Dict, store: Optional[BlockStore]) -> Optional[BlockRef]:
+    """
+    In tiered mode, move a record's cold fields to the block store.
+    
+    Returns:
+        Reference to the stored block, or None if nothing was moved
+    """
+    if store is None:
+        return None
+    cold = {key: info.pop(key) for key in _COLD_FIELDS if key in info}
+    return store.put(cold) if cold else None
+
+
+def _code_fingerprint() -> bytes:
+    """Fingerprint of the package code, computed once per process."""
+    global _fingerprint
+    if _fingerprint is None:
+        if CODE_FINGERPRINT is not None:
+            _fingerprint = bytes.fromhex(CODE_FINGERPRINT)
+        else:
+            # Source checkout or editable install: the code may still change,
+            # and its files' stat signatures are much cheaper than hashing them
+            signatures = []
+            for path in package_sources(os.path.dirname(os.path.abspath(__file__))):
+                stat = os.stat(path)
+                signatures.append(f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}")
+            _fingerprint = source_fingerprint(extra=signatures)
+    return _fingerprint
+
+
+def _catalog_fingerprint(source_digest: Optional[bytes] = None) -> bytes:
+    """Fingerprint of the code, and catalog file contents if any, behind a catalog."""
+    code = _code_fingerprint()
+    if source_digest is None:
+        return code
+    return source_fingerprint(extra=[code.hex(), source_digest.hex()])
+
+
+def _timed_query(method):
+    """Record the latency of a public query in the database's reload stats."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        reloading = self._reloading
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._stats.record_query(time.perf_counter() - start,
+                                     reloading or self._reloading)
+    return wrapper
+
+
+class _Catalog:
+    """
+    One version of the catalog together with everything derived from it.
+
+    Queries read MedicineDatabase._catalog once and work on that object only,
+    so a reload that swaps in a new version never affects a query in flight.
+    """
+
+    def __init__(self, sections: Dict[str, Dict], generation: int,
+                 storage: Optional[TieredStorage] = None,
+                 source_digest: Optional[bytes] = None,
+                 store: Optional[BlockStore] = None,
+                 cold: Optional[Mapping[str, BlockRef]] = None):
+        self.generation = generation
+        # Sequence number of the last change log entry applied
+        self.seq = 0
+        self.storage = storage
+        # SHA-256 of the catalog file contents this version was built from
+        self.source_digest = source_digest
+        self.pregnancy_categories: Dict[str, str] = sections["pregnancy_categories"]
+        self.lactation_categories: Dict[str, str] = sections["lactation_categories"]
+        self.condition_aliases: Dict[str, List[str]] = sections["condition_aliases"]
+        self.categories: Dict[str, List[str]] = sections["categories"]
+        self.category_parents: Dict[str, List[str]] = sections["category_parents"]
+        # Per-record tables are persistent maps shared between versions
+        self.medicines: PersistentMap = PersistentMap(sections["medicines"])
+        self.category_index = CategoryIndex(self.categories, self.category_parents)
+        self._init_cold_storage(store, cold)
+        # Adult dosage parsed once per catalog version, for dose validation
+        dosages = {}
+        for generic_name, info in self.medicines.items():
+            spec = self.dosage_spec(info)
+            if spec is not None:
+                dosages[generic_name] = spec
+        self.dosages: PersistentMap = PersistentMap(dosages)
+
+    def evolve(self) -> "_Catalog":
+        """
+        Return the next version of this catalog, ready to apply changes to.
+        
+        Everything is shared: changes replace the persistent per-record tables
+        with modified copies, in O(log number of records), so queries running
+        on this version are unaffected.
+        """
+        clone = _Catalog.__new__(_Catalog)
+        clone.__dict__.update(self.__dict__)
+        clone.generation = self.generation + 1
+        return clone
+
+    def apply(self, change: Change) -> None:
+        """
+        Apply one change to this (evolved) catalog.
+        
+        Everything the change derives is computed before the catalog is
+        touched, so a change that fails leaves it as it was.
+        """
+        name = change.generic_name
+        if change.op == PUT:
+            record = _thaw(change.record)
+            spec = self.dosage_spec(record)
+            ref = _split_cold_fields(record, self.store)
+            self.medicines = self.medicines.set(name, record)
+            self.cold = self._put(self.cold, name, ref)
+            self.dosages = self._put(self.dosages, name, spec)
+        elif change.op == DELETE:
+            self.medicines = self.medicines.discard(name)
+            self.cold = self.cold.discard(name)
+            self.dosages = self.dosages.discard(name)
+        elif change.op == SECTIONS:
+            sections = {section: _thaw(value) for section, value in change.record.items()}
+            category_index = CategoryIndex(sections.get("categories", self.categories),
+                                           sections.get("category_parents", self.category_parents))
+            for section, value in sections.items():
+                setattr(self, section, value)
+            self.category_index = category_index
+        else:
+            raise ValueError(f"unknown change operation {change.op!r}")
+        self.seq = change.seq
+
+    @staticmethod
+    def _put(table: PersistentMap, key: str, value: Any) -> PersistentMap:
+        """Return a table with an entry set, or removed if value is None."""
+        return table.discard(key) if value is None else table.set(key, value)
+
+    def _init_cold_storage(self, store: Optional[BlockStore] = None,
+                           cold: Optional[Mapping[str, BlockRef]] = None) -> None:
+        """
+        In tiered mode, move the cold fields of every record to a block store.
+        
+        Args:
+            store: Store to use, default a new one
+            cold: Blocks in store of records whose cold fields were already
+                moved there
+        """
+        refs = dict(cold.items()) if cold else {}
+        self.store: Optional[BlockStore] = None
+        self.cache: Optional[RecordCache] = None
+        if self.storage is not None:
+            self.store = store if store is not None else BlockStore(self.storage.directory)
+            self.cache = RecordCache(self.storage.cache_bytes)
+            for generic_name, info in self.medicines.items():
+                ref = _split_cold_fields(info, self.store)
+                if ref is not None:
+                    refs[generic_name] = ref
+        self.cold: PersistentMap = PersistentMap(refs)
+
+    def __getstate__(self) -> Dict:
+        # Cold fields stay out of the pickled state: save_snapshot() stores
+        # the blocks after it, in cold_blocks() order, and the state refers
+        # to them by their offsets there
+        state = self.__dict__.copy()
+        offset, cold = 0, {}
+        for generic_name, (_, length) in self.cold.items():
+            cold[generic_name] = (offset, length)
+            offset += length
+        state["cold"] = PersistentMap(cold)
+        state["storage"] = None
+        del state["store"], state["cache"]
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        # Without its blocks until attach_blocks() is called
+        self.store = None
+        self.cache = None
+
+    def cold_blocks(self) -> Iterator[bytes]:
+        """Yield the compressed cold fields of every record that has some, in table order."""
+        for ref in self.cold.values():
+            yield self.store.read_raw(ref)
+
+    def attach_blocks(self, store: Optional[BlockStore],
+                      storage: Optional[TieredStorage]) -> None:
+        """
+        Finish loading a catalog from a snapshot.
+        
+        Args:
+            store: Store holding the snapshot's cold_blocks(), if it had any
+            storage: Storage mode to switch to; without one, cold fields are
+                read back into the records and store is closed
+        """
+        if storage is None:
+            if store is not None:
+                for generic_name, ref in self.cold.items():
+                    self.medicines[generic_name].update(store.get(ref))
+                store.close()
+            self.cold = PersistentMap()
+        else:
+            self.storage = storage
+            self._init_cold_storage(store, self.cold)
+
+    def cold_fields(self, generic_name: str) -> Mapping[str, Any]:
+        """Return a record's frozen cold fields, through the LRU cache."""
+        ref = self.cold.get(generic_name)
+        if ref is None:
+            return _NO_FIELDS
+
+        def load():
+            value = _freeze(self.store.get(ref))
+            return value, value_size(value)
+
+        # Keyed by block, so entries of replaced records simply age out
+        return self.cache.get(ref, load)
+
+    def cold_block(self, generic_name: str) -> Optional[bytes]:
+        """Return a record's cold fields as stored, compressed, bypassing the cache."""
+        ref = self.cold.get(generic_name)
+        return None if ref is None else self.store.read_raw(ref)
+
+    def own_fields(self, generic_name: str, cached: bool = True) -> Dict:
+        """
+        Return a copy of a record's own fields, including cold ones, without defaults.
+        
+        Args:
+            generic_name: Record to read
+            cached: Read cold fields through the LRU cache; bulk readers pass
+                False so they do not evict the records queries are using
+        """
+        own = {key: _thaw(value) for key, value in self.medicines[generic_name].items()}
+        ref = self.cold.get(generic_name)
+        if ref is not None:
+            if cached:
+                own.update(_thaw(self.cold_fields(generic_name)))
+            else:
+                own.update(self.store.get(ref))
+        return own
+
+    def sections(self) -> Dict[str, Dict]:
+        """Return the raw catalog sections."""
+        sections = {section: getattr(self, section) for section in _CATALOG_SECTIONS[:-1]}
+        if self.store is not None:
+            sections["medicines"] = {name: self.own_fields(name, cached=False) for name in self.medicines}
+        else:
+            sections["medicines"] = dict(self.medicines.items())
+        return sections
+
+    def field(self, generic_name: str, field: str) -> Any:
+        """Return a copy of a record's own value for a field, else of the default."""
+        info = self.medicines[generic_name]
+        if field in info:
+            return _thaw(info[field])
+        if generic_name in self.cold:
+            cold = self.cold_fields(generic_name)
+            if field in cold:
+                return _thaw(cold[field])
+        return _thaw(_DEFAULT_INFO.get(field))
+
+    @staticmethod
+    def dosage_spec(info: Mapping[str, Any]) -> Optional[DosageSpec]:
+        """Parse the adult dosage of a record's own fields, else of the default."""
+        return parse_dosage(info.get("dosage", _DEFAULT_INFO["dosage"]).get("adult"))
+
+    def merged(self, generic_name: str) -> Dict:
+        """Return copies of a record's own fields followed by its defaulted ones."""
+        # Records are shared by catalog versions, so callers only get copies
+        merged = {key: _thaw(value) for key, value in self.medicines[generic_name].items()}
+        if generic_name in self.cold:
+            for key, value in self.cold_fields(generic_name).items():
+                merged[key] = _thaw(value)
+        for key, value, copy in _DEFAULT_COPIES:
+            if key not in merged:
+                merged[key] = value if copy is None else copy()
+        return merged
+
+
+class _ReloadStats:
+    """
+    Counters behind MedicineDatabase.reload_stats().
+
+    Query counters are updated without locking, so they are approximate when
+    many threads query at once.
+    """
 
-class MedicineDatabase:
     def __init__(self):
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self.last_reload_seconds: Optional[float] = None
+        self.total_reload_seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.reload_queries = 0
+        self.reload_query_seconds = 0.0
+        self.reload_query_max_seconds = 0.0
+        self.subscriber_errors = 0
+        self.last_subscriber_error: Optional[str] = None
+
+    def record_query(self, seconds: float, during_reload: bool) -> None:
+        if during_reload:
+            self.reload_queries += 1
+            self.reload_query_seconds += seconds
+            if seconds > self.reload_query_max_seconds:
+                self.reload_query_max_seconds = seconds
+        else:
+            self.queries += 1
+            self.query_seconds += seconds
+
+
+class MedicineDatabase:
+    def __init__(self, catalog_path: Optional[str] = None,
+                 poll_interval: Optional[float] = None,
+                 tiered_storage: Optional[TieredStorage] = None):
+        """
+        Build the medicine database.
+        
+        Args:
+            catalog_path: Optional JSON catalog file to load instead of the
+                built-in catalog (see export_catalog() for the format)
+            poll_interval: If given together with catalog_path, watch the file
+                and reload it this many seconds after it changes
+            tiered_storage: If given, keep bulky text fields (description,
+                pregnancy/lactation safety, precautions) compressed on disk
+                behind an LRU cache bounded by tiered_storage.cache_bytes
+        """
+        signature = self._file_signature(catalog_path) if catalog_path else None
+        catalog = self._load_catalog(catalog_path, 1, tiered_storage)
+        self._setup(catalog, catalog_path, signature)
+        if catalog_path and poll_interval:
+            self.start_watching(poll_interval)
+
+    def _setup(self, catalog: _Catalog, catalog_path: Optional[str],
+               signature: Optional[tuple]) -> None:
+        """Initialize the runtime (non-persisted) state around a built catalog."""
+        self._catalog = catalog
+        self._catalog_path = catalog_path
+        self._catalog_signature = signature
+        # Serializes reloads and mutations
+        self._write_lock = threading.RLock()
+        # (evolved catalog, applied changes) of the open batch() block
+        self._batch: Optional[Tuple[_Catalog, List[Change]]] = None
+        self._changes = ChangeLog(start_seq=catalog.seq)
+        self._subscribers: List[Callable[[List[Dict]], None]] = []
+        self._reloading = False
+        self._stats = _ReloadStats()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    @staticmethod
+    def _builtin_catalog() -> Dict[str, Dict]:
+        """Return freshly built sections of the built-in catalog."""
+        sections = MedicineDatabase._builtin_sections()
+        sections["medicines"] = MedicineDatabase._builtin_medicines()
+        return sections
+
+    @staticmethod
+    def _builtin_sections() -> Dict[str, Dict]:
+        """Return freshly built sections of the built-in catalog, except medicines."""
         # Initialize pregnancy categories with descriptions
-        self._pregnancy_categories = {
+        pregnancy_categories = {
             "A": "Adequate studies show no risk",
             "B": "Animal studies show no risk but human studies inadequate, or animal studies show risk but human studies show no risk",
             "C": "Animal studies show adverse effects but human studies inadequate, or no studies available",
@@ -15,7 +516,7 @@ class MedicineDatabase:
         }
         
         # Initialize lactation safety categories
-        self._lactation_categories = {
+        lactation_categories = {
             "safe": "Compatible with breastfeeding",
             "moderate_safe": "Usually compatible, monitor infant",
             "caution": "Limited data available, use with caution",
@@ -23,7 +524,7 @@ class MedicineDatabase:
         }
 
         # Common condition aliases for better search results
-        self._condition_aliases = {
+        condition_aliases = {
             "high blood pressure": ["hypertension"],
             "diabetes": ["type 1 diabetes", "type 2 diabetes", "diabetes mellitus"],
             "high cholesterol": ["hypercholesterolemia"],
@@ -44,7 +545,7 @@ class MedicineDatabase:
         }
         
         # Medicine categories for better organization
-        self._categories = {
+        categories = {
             "antibiotics": ["amoxicillin", "azithromycin", "ciprofloxacin", "doxycycline", "metronidazole"],
             "painkillers": ["paracetamol", "ibuprofen", "tramadol"],
             "antidepressants": ["fluoxetine", "sertraline", "venlafaxine", "escitalopram"],
@@ -67,8 +568,23 @@ class MedicineDatabase:
             "antacids": ["omeprazole", "pantoprazole", "ranitidine"]
         }
         
+        # Category hierarchy: subcategory -> parent categories
+        category_parents = {
+            "antacids": ["stomach"]
+        }
+        return {
+            "pregnancy_categories": pregnancy_categories,
+            "lactation_categories": lactation_categories,
+            "condition_aliases": condition_aliases,
+            "categories": categories,
+            "category_parents": category_parents,
+        }
+
+    @staticmethod
+    def _builtin_medicines() -> Dict[str, Dict]:
+        """Return freshly built records of the built-in catalog."""
         # Initialize medicine database with enhanced information
-        self._medicines: Dict[str, Dict] = {
+        medicines: Dict[str, Dict] = {
             "paracetamol": {
                 "uses": ["fever reduction", "pain relief", "headache treatment"],
                 "conditions": ["fever", "common cold", "headache", "muscle pain", "arthritis"],
@@ -387,99 +903,715 @@ class MedicineDatabase:
                 "lactation_safety": "Compatible with breastfeeding"
             }
         }
+        return medicines
+
+    @staticmethod
+    def _read_catalog_file(path: str, store: Optional[BlockStore] = None
+                           ) -> Tuple[Dict[str, Dict], bytes, Dict[str, BlockRef]]:
+        """
+        Read the sections of an external JSON catalog file.
         
-        # Update existing medicines with default safety info
-        self._update_medicine_info()
-
-    def _update_medicine_info(self):
-        """Updates existing medicines with dosage, contraindications, and safety info."""
-        default_info = {
-            "dosage": {
-                "adult": "Consult physician for proper dosing",
-                "child": "Consult physician for proper dosing",
-                "form": ["tablet"]
-            },
-            "contraindications": [
-                "Known hypersensitivity",
-                "Consult physician for complete list"
-            ],
-            "side_effects": [
-                "Consult physician or package insert for complete list"
-            ],
-            "precautions": [
-                "Consult physician before use",
-                "Follow prescribed dosage carefully"
-            ],
-            "pregnancy_category": "C",
-            "pregnancy_safety": "Insufficient data available, use only if benefit outweighs risk",
-            "lactation_category": "caution",
-            "lactation_safety": "Limited data available, consult healthcare provider"
+        Sections other than "medicines" are optional and default to the
+        built-in ones. Records are read one at a time and stripped of
+        default values; given a block store, their cold fields are moved
+        there as they are read, so the file is never held in memory whole.
+        
+        Returns:
+            The sections, the SHA-256 digest of the file contents they were
+            parsed from, and the blocks in store of records' cold fields
+        
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not a valid catalog
+        """
+        # Digest the very bytes parsed: the file may be replaced at any time
+        digest = hashlib.sha256()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        sections: Dict[str, Dict] = {}
+        medicines: Optional[Dict[str, Dict]] = None
+        cold: Dict[str, BlockRef] = {}
+        with open(path, "rb") as handle:
+            def read(size: int) -> str:
+                data = handle.read(size)
+                digest.update(data)
+                return decoder.decode(data, final=not data)
+
+            stream = JsonStream(read)
+            if stream.peek() != "{":
+                raise ValueError(f"{path!r} is not a catalog: missing 'medicines' object")
+            for section in stream.members():
+                if section != "medicines":
+                    value = stream.value()
+                    if section in _CATALOG_SECTIONS:
+                        MedicineDatabase._check_catalog_section(section, value)
+                        sections[section] = value
+                    continue
+                if stream.peek() != "{":
+                    raise ValueError(f"{path!r} is not a catalog: missing 'medicines' object")
+                medicines = {}
+                for name in stream.members():
+                    info = stream.value()
+                    MedicineDatabase._check_catalog_entry(name, info)
+                    # Lookups lowercase the name they are given, so keys must match
+                    if name.lower() in medicines:
+                        raise ValueError(f"duplicate catalog entry for {name!r}")
+                    info.setdefault("uses", [])
+                    info.setdefault("conditions", [])
+                    info.setdefault("description", "")
+                    MedicineDatabase._strip_defaults([info])
+                    ref = _split_cold_fields(info, store)
+                    if ref is not None:
+                        cold[name.lower()] = ref
+                    medicines[name.lower()] = info
+            stream.end()
+        if medicines is None:
+            raise ValueError(f"{path!r} is not a catalog: missing 'medicines' object")
+        for section, value in MedicineDatabase._builtin_sections().items():
+            sections.setdefault(section, value)
+        sections["medicines"] = medicines
+        sections["categories"] = {
+            category: [name.lower() for name in names] for category, names in sections["categories"].items()
         }
+        return sections, digest.digest(), cold
+
+    @staticmethod
+    def _check_catalog_section(section: str, value: Any) -> None:
+        """
+        Check the shape of one catalog section.
+        
+        Raises:
+            ValueError: If the section is not an object of the expected values
+        """
+        if not isinstance(value, dict):
+            raise ValueError(f"catalog section {section!r} must be an object")
+        if section in _TEXT_LIST_SECTIONS and not all(_is_text_list(item) for item in value.values()):
+            raise ValueError(f"catalog section {section!r} must map names to lists of strings")
+
+    @staticmethod
+    def _check_record(name: str, record: Any) -> None:
+        """
+        Check a record about to be written by a mutation or replayed change.
         
-        # Update all medicines with default info if not present
-        for medicine in self._medicines.values():
-            for key, value in default_info.items():
-                if key not in medicine:
-                    medicine[key] = value
+        Raises:
+            ValueError: If the record has fields of the wrong type or lacks
+                a required one
+        """
+        MedicineDatabase._check_catalog_entry(name, record)
+        for key in _REQUIRED_FIELDS:
+            if key not in record:
+                raise ValueError(f"invalid catalog entry for {name!r}: missing {key!r}")
 
-    def search_by_condition(self, condition: str) -> List[Dict]:
+    @staticmethod
+    def _check_change(op: Any, generic_name: Any, record: Any) -> None:
+        """
+        Check a change received by apply_changes() before applying any of them.
+        
+        Raises:
+            ValueError: If the change is malformed
+        """
+        if op == SECTIONS:
+            if not isinstance(record, dict):
+                raise ValueError("'sections' change must carry an object of sections")
+            for section, value in record.items():
+                if section not in _CATALOG_SECTIONS[:-1]:
+                    raise ValueError(f"unknown catalog section {section!r}")
+                MedicineDatabase._check_catalog_section(section, value)
+            return
+        if op not in (PUT, DELETE):
+            raise ValueError(f"unknown change operation {op!r}")
+        if not isinstance(generic_name, str):
+            raise ValueError(f"invalid medicine name {generic_name!r}")
+        if op == PUT:
+            MedicineDatabase._check_record(generic_name, record)
+
+    @staticmethod
+    def _check_catalog_entry(name: str, info: Any) -> None:
+        """
+        Check the field types of one catalog file entry.
+        
+        Raises:
+            ValueError: If the entry does not have the shape of a record
+        """
+        if not isinstance(info, dict):
+            raise ValueError(f"invalid catalog entry for {name!r}: expected an object")
+        for key in _TEXT_LIST_FIELDS:
+            if key in info and not _is_text_list(info[key]):
+                raise ValueError(f"invalid catalog entry for {name!r}: {key!r} must be a list of strings")
+        for key in _TEXT_FIELDS:
+            if key in info and not isinstance(info[key], str):
+                raise ValueError(f"invalid catalog entry for {name!r}: {key!r} must be a string")
+        dosage = info.get("dosage", {})
+        if (not isinstance(dosage, dict)
+                or not _is_text_list(dosage.get("form", []))
+                or not all(isinstance(value, str) for key, value in dosage.items() if key != "form")):
+            raise ValueError(f"invalid catalog entry for {name!r}: 'dosage' must be an object "
+                             "of strings with a 'form' list of strings")
+
+    @staticmethod
+    def _file_signature(path: str) -> Optional[tuple]:
+        """Return what the watcher compares to detect a changed catalog file."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load_catalog(self, catalog_path: Optional[str], generation: int,
+                      storage: Optional[TieredStorage] = None) -> _Catalog:
+        """Build a catalog version, including all derived data, from its file or the built-in one."""
+        if catalog_path is None:
+            sections = self._builtin_catalog()
+            self._strip_defaults(sections["medicines"].values())
+            return _Catalog(sections, generation, storage)
+        store = BlockStore(storage.directory) if storage is not None else None
+        sections, digest, cold = self._read_catalog_file(catalog_path, store)
+        return _Catalog(sections, generation, storage, digest, store, cold)
+
+    @staticmethod
+    def _strip_defaults(medicines: Iterable[Dict]) -> None:
+        """Drop record fields that merely repeat the shared defaults layer."""
+        for medicine in medicines:
+            for key, value in _DEFAULT_VALUES.items():
+                if key in medicine and medicine[key] == value:
+                    del medicine[key]
+
+    def save_snapshot(self, path: str) -> None:
+        """
+        Persist the fully built database to a snapshot file.
+        
+        Args:
+            path: Destination file path, replaced atomically
+        """
+        catalog = self._catalog
+        write_snapshot(path, catalog, _catalog_fingerprint(catalog.source_digest),
+                       catalog.cold_blocks())
+
+    @classmethod
+    def load_snapshot(cls, path: str, catalog_path: Optional[str] = None,
+                      poll_interval: Optional[float] = None,
+                      tiered_storage: Optional[TieredStorage] = None) -> "MedicineDatabase":
+        """
+        Load a database from a snapshot written by save_snapshot().
+        
+        A missing, stale (written by a different version of this module or
+        from a different catalog file) or corrupt snapshot is ignored and the
+        database is rebuilt from scratch.
+        
+        Args:
+            path: Snapshot file path
+            catalog_path: Catalog file the snapshot was built from, if any
+            poll_interval: Passed on to the database, see __init__()
+            tiered_storage: Passed on to the database, see __init__()
+            
+        Returns:
+            A ready-to-query MedicineDatabase
+        """
+        store = None
+
+        def copy_blocks(data: bytes) -> None:
+            # Cold blocks go straight to a store, never all into memory
+            nonlocal store
+            if store is None:
+                store = BlockStore(tiered_storage.directory if tiered_storage else None)
+            store.append(data)
+
+        try:
+            signature = cls._file_signature(catalog_path) if catalog_path else None
+            digest = file_digest(catalog_path) if catalog_path else None
+            catalog = read_snapshot(path, _catalog_fingerprint(digest), copy_blocks)
+        except (OSError, SnapshotError):
+            catalog = None
+        if not isinstance(catalog, _Catalog):
+            if store is not None:
+                store.close()
+            return cls(catalog_path, poll_interval, tiered_storage)
+        catalog.attach_blocks(store, tiered_storage)
+        db = cls.__new__(cls)
+        db._setup(catalog, catalog_path, signature)
+        if catalog_path and poll_interval:
+            db.start_watching(poll_interval)
+        return db
+
+    def export_catalog(self, path: str) -> None:
+        """
+        Write the current catalog to a JSON catalog file.
+        
+        The file has one top-level object per section: "pregnancy_categories",
+        "lactation_categories", "condition_aliases", "categories" and
+        "medicines". It can be loaded with MedicineDatabase(catalog_path=path).
+        
+        Args:
+            path: Destination file path, replaced atomically
+        """
+        data = json.dumps(self._catalog.sections(), indent=2, ensure_ascii=False)
+        atomic_write(path, data.encode("utf-8"))
+
+    @property
+    def generation(self) -> int:
+        """Version number of the catalog, incremented on every change."""
+        return self._catalog.generation
+
+    def reload(self) -> bool:
+        """
+        Rebuild the catalog from its file and atomically swap it in.
+        
+        The new version is built while queries keep running against the old
+        one. If the file cannot be read or is invalid, the old version stays
+        in place and the error is reported by reload_stats().
+        
+        Returns:
+            True if a new catalog version was swapped in
+        """
+        if self._catalog_path is None:
+            raise ValueError("database is not backed by a catalog file")
+        with self._write_lock:
+            if self._batch is not None:
+                raise RuntimeError("cannot reload inside a batch() block")
+            self._reloading = True
+            try:
+                start = time.perf_counter()
+                signature = self._file_signature(self._catalog_path)
+                try:
+                    catalog = self._load_catalog(self._catalog_path, self._catalog.generation + 1,
+                                                 self._catalog.storage)
+                except Exception as exc:
+                    # Whatever the file contains, a bad version must never
+                    # replace the one being served
+                    self._stats.failed_reloads += 1
+                    self._stats.last_error = f"{type(exc).__name__}: {exc}"
+                    self._catalog_signature = signature
+                    return False
+                changes = self._diff(self._catalog, catalog)
+                catalog.seq = changes[-1].seq if changes else self._catalog.seq
+                self._changes.append(changes)
+                self._catalog = catalog
+                self._catalog_signature = signature
+            finally:
+                self._reloading = False
+            self._notify(changes)
+            elapsed = time.perf_counter() - start
+            self._stats.reloads += 1
+            self._stats.last_error = None
+            self._stats.last_reload_seconds = elapsed
+            self._stats.total_reload_seconds += elapsed
+            return True
+
+    def _diff(self, old: _Catalog, new: _Catalog) -> List[Change]:
+        """Express the difference between two catalog versions as changes."""
+        seq = old.seq
+        changes = []
+        old_sections = {section: getattr(old, section) for section in _CATALOG_SECTIONS[:-1]}
+        new_sections = {section: getattr(new, section) for section in _CATALOG_SECTIONS[:-1]}
+        if old_sections != new_sections:
+            seq += 1
+            changes.append(Change(seq, SECTIONS, None, _freeze(new_sections)))
+        for name, info in new.medicines.items():
+            # Cold fields are compared as stored, compressed the same way,
+            # rather than decoded: that would load every record through
+            # the cache and evict what queries are using
+            if (old.medicines.get(name) != info
+                    or old.cold_block(name) != new.cold_block(name)):
+                seq += 1
+                changes.append(Change(seq, PUT, name, _freeze(new.own_fields(name, cached=False))))
+        for name in old.medicines:
+            if name not in new.medicines:
+                seq += 1
+                changes.append(Change(seq, DELETE, name, None))
+        return changes
+
+    def _commit(self, changes: List[Tuple[str, Optional[str], Any]],
+                seqs: Optional[List[int]] = None) -> None:
+        """
+        Apply changes to a new catalog version, swap it in and log them.
+        
+        Args:
+            changes: (op, generic_name, record) tuples
+            seqs: Sequence numbers to use (when replaying), default the next ones
+        """
+        with self._write_lock:
+            if self._batch is not None:
+                catalog, applied = self._batch
+            else:
+                catalog, applied = self._catalog.evolve(), []
+            for i, (op, generic_name, record) in enumerate(changes):
+                seq = seqs[i] if seqs is not None else catalog.seq + 1
+                change = Change(seq, op, generic_name, _freeze(record) if record is not None else None)
+                catalog.apply(change)
+                applied.append(change)
+            if self._batch is None:
+                self._publish(catalog, applied)
+
+    def _publish(self, catalog: _Catalog, changes: List[Change]) -> None:
+        """Log changes, swap in the catalog they produced and notify subscribers."""
+        with self._write_lock:
+            # Logged first: if the log rejects the changes, nothing is swapped in
+            self._changes.append(changes)
+            self._catalog = catalog
+            # Notified under the lock, so subscribers get batches in order
+            self._notify(changes)
+
+    def _pending_catalog(self) -> _Catalog:
+        """Return the catalog mutations apply to: the open batch's, else the current one."""
+        return self._batch[0] if self._batch is not None else self._catalog
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group mutations into a single new catalog version.
+        
+        Every mutation outside a batch publishes a version of its own, logged
+        and sent to subscribers on its own. Inside a batch the changes are
+        swapped in, logged and sent to subscribers together when the block
+        exits, and discarded if it raises. Other writers wait for the block to finish;
+        queries keep seeing the previous version until then.
+        """
+        with self._write_lock:
+            if self._batch is not None:
+                yield
+                return
+            catalog, applied = self._catalog.evolve(), []
+            self._batch = (catalog, applied)
+            try:
+                yield
+            finally:
+                self._batch = None
+            if applied:
+                self._publish(catalog, applied)
+
+    def _notify(self, changes: List[Change]) -> None:
+        if changes and self._subscribers:
+            payload = [self._change_dict(change) for change in changes]
+            for callback in list(self._subscribers):
+                try:
+                    callback(payload)
+                except Exception as exc:
+                    # The changes are already published: a failing subscriber
+                    # must not fail the write or starve the other subscribers
+                    self._stats.subscriber_errors += 1
+                    self._stats.last_subscriber_error = f"{type(exc).__name__}: {exc}"
+
+    @staticmethod
+    def _change_dict(change: Change) -> Dict:
+        return {
+            "seq": change.seq,
+            "op": change.op,
+            "generic_name": change.generic_name,
+            "record": _thaw(change.record),
+        }
+
+    @property
+    def change_seq(self) -> int:
+        """Sequence number of the last change applied to the catalog."""
+        return self._catalog.seq
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """The catalog (generation, change_seq), read from one consistent version."""
+        catalog = self._catalog
+        return catalog.generation, catalog.seq
+
+    def changes_since(self, seq: int) -> List[Dict]:
+        """
+        Get the changes made after a sequence number, for replaying elsewhere.
+        
+        Args:
+            seq: Last sequence number already seen (0 for the start)
+            
+        Returns:
+            List of changes, each with "seq", "op" ("put", "delete" or
+            "sections"), "generic_name" and "record" (the record's own fields
+            for "put", the replaced sections for "sections")
+            
+        Raises:
+            ChangeLogTruncated: If the changes are no longer retained, in which
+                case the replica has to reload the full catalog
+        """
+        return [self._change_dict(change) for change in self._changes.since(seq)]
+
+    def apply_changes(self, changes: Iterable[Dict]) -> int:
+        """
+        Replay changes from another database's changes_since() on this replica.
+        
+        Changes this replica has already applied are skipped.
+        
+        Args:
+            changes: Changes as returned by changes_since()
+            
+        Returns:
+            Number of changes applied
+            
+        Raises:
+            ValueError: If the changes do not continue this replica's
+                sequence or one of them is malformed; none are applied then
+        """
+        with self._write_lock:
+            expected = self._pending_catalog().seq + 1
+            pending, seqs = [], []
+            for change in changes:
+                if change["seq"] < expected:
+                    continue
+                if change["seq"] != expected:
+                    raise ValueError(f"missing changes {expected}-{change['seq'] - 1}, reload the catalog")
+                self._check_change(change["op"], change["generic_name"], change["record"])
+                pending.append((change["op"], change["generic_name"], change["record"]))
+                seqs.append(change["seq"])
+                expected += 1
+            if pending:
+                self._commit(pending, seqs)
+            return len(pending)
+
+    def subscribe(self, callback: Callable[[List[Dict]], None]) -> None:
+        """
+        Call a function with every batch of changes after it is applied.
+        
+        Callbacks run in the writing thread while it holds the write lock, so
+        they see batches in sequence order and should return quickly. An
+        exception raised by a callback is counted in reload_stats() and
+        otherwise ignored.
+        
+        Args:
+            callback: Receives a list of changes as returned by changes_since()
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[List[Dict]], None]) -> None:
+        """Stop calling a function registered with subscribe()."""
+        self._subscribers.remove(callback)
+
+    def start_watching(self, poll_interval: float = 1.0) -> None:
+        """
+        Poll the catalog file in a background thread and reload it on change.
+        
+        Args:
+            poll_interval: Seconds between checks of the file's mtime and size
+        """
+        if self._catalog_path is None:
+            raise ValueError("database is not backed by a catalog file")
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(poll_interval,),
+                                         name="pharmatech-catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Stop the background watcher started by start_watching()."""
+        watcher = self._watcher
+        if watcher is None:
+            return
+        self._stop_watching.set()
+        watcher.join()
+        self._watcher = None
+
+    def _watch(self, poll_interval: float) -> None:
+        while not self._stop_watching.wait(poll_interval):
+            try:
+                if self._file_signature(self._catalog_path) != self._catalog_signature:
+                    self.reload()
+            except Exception as exc:
+                # Keep watching; the next change to the file may fix it
+                self._stats.failed_reloads += 1
+                self._stats.last_error = f"{type(exc).__name__}: {exc}"
+
+    def reload_stats(self) -> Dict:
+        """
+        Get statistics about catalog reloads and their effect on queries.
+        
+        Returns:
+            Dictionary with the catalog generation, reload counts and times,
+            the last reload error, mean query latency outside reloads
+            compared with mean and max latency of queries that overlapped one,
+            and the number and last of the errors raised by subscribers
+        """
+        stats = self._stats
+        baseline = stats.query_seconds / stats.queries if stats.queries else 0.0
+        during = stats.reload_query_seconds / stats.reload_queries if stats.reload_queries else 0.0
+        return {
+            "generation": self._catalog.generation,
+            "catalog_path": self._catalog_path,
+            "watching": self._watcher is not None,
+            "reloads": stats.reloads,
+            "failed_reloads": stats.failed_reloads,
+            "last_error": stats.last_error,
+            "last_reload_seconds": stats.last_reload_seconds,
+            "total_reload_seconds": stats.total_reload_seconds,
+            "queries": stats.queries,
+            "mean_query_seconds": baseline,
+            "queries_during_reload": stats.reload_queries,
+            "mean_query_seconds_during_reload": during,
+            "max_query_seconds_during_reload": stats.reload_query_max_seconds,
+            "reload_latency_spike_seconds": max(0.0, stats.reload_query_max_seconds - baseline),
+            "subscriber_errors": stats.subscriber_errors,
+            "last_subscriber_error": stats.last_subscriber_error,
+        }
+
+    # Searches that accept explain=True, by name
+    _EXPLAINABLE = (
+        "search_by_condition",
+        "search_by_category",
+        "search_by_side_effect",
+        "search_by_form",
+        "search_safe_in_pregnancy",
+        "search_safe_in_lactation",
+    )
+
+    def explain_query(self, query: str, *args) -> Dict:
+        """
+        Run a search and report how it was executed.
+        
+        Args:
+            query: Name of the search method, e.g. "search_by_condition"
+            args: Arguments of the search
+            
+        Returns:
+            Dictionary with the query and argument, catalog generation,
+            expanded search "terms", the "access_path" taken (full_scan or an
+            index), "candidates_examined" versus "returned", per-stage
+            timings in "stages" and "total_seconds"
+        """
+        if query not in self._EXPLAINABLE:
+            raise ValueError(f"cannot explain {query!r}, expected one of {', '.join(self._EXPLAINABLE)}")
+        return getattr(self, query)(*args, explain=True)[1]
+
+    def storage_stats(self) -> Dict:
+        """
+        Get statistics about tiered storage.
+        
+        Returns:
+            Dictionary with whether tiered storage is on, the number of records
+            with cold fields, the block store size and the LRU cache counters
+        """
+        catalog = self._catalog
+        if catalog.store is None:
+            return {"tiered": False}
+        return {
+            "tiered": True,
+            "cold_records": len(catalog.cold),
+            "store_bytes": catalog.store.size,
+            "cache": catalog.cache.stats(),
+        }
+
+    @staticmethod
+    def _record(catalog: _Catalog, generic_name: str) -> Optional[Dict]:
+        """Return the merged record for a medicine in a catalog version."""
+        name = generic_name.lower()
+        if name in catalog.medicines:
+            return {
+                "generic_name": name,
+                **catalog.merged(name)
+            }
+        return None
+
+    @_timed_query
+    def search_by_condition(self, condition: str, explain: bool = False) -> List[Dict]:
         """
         Search for medicines that treat a specific condition.
         
         Args:
             condition: The medical condition or symptom to search for
+            explain: Also return the query plan, see explain_query()
             
         Returns:
-            List of medicines that can treat the condition
+            List of medicines that can treat the condition, or a
+            (results, plan) tuple if explain is set
         """
+        catalog = self._catalog
+        plan = QueryPlan("search_by_condition", condition, catalog.generation) if explain else NO_PLAN
         condition_lower = condition.lower()
         result = []
         
         # Check for condition aliases
-        search_terms = [condition_lower]
-        for alias, variants in self._condition_aliases.items():
-            if condition_lower in alias.lower() or any(condition_lower in v.lower() for v in variants):
-                search_terms.extend([v.lower() for v in variants])
-                search_terms.append(alias.lower())
+        with plan.stage("expand_aliases") as stage:
+            search_terms = [condition_lower]
+            for alias, variants in catalog.condition_aliases.items():
+                if condition_lower in alias.lower() or any(condition_lower in v.lower() for v in variants):
+                    search_terms.extend([v.lower() for v in variants])
+                    search_terms.append(alias.lower())
+                    if plan:
+                        stage.setdefault("aliases_matched", {})[alias] = len(variants) + 1
+            stage["aliases_examined"] = len(catalog.condition_aliases)
+        plan["terms"] = search_terms
+        plan["access_path"] = "full_scan"
         
         # Search through medicines with all possible terms
-        for generic_name, info in self._medicines.items():
-            conditions_lower = [c.lower() for c in info['conditions']]
-            if any(term in conditions_lower or 
-                  any(term in c for c in conditions_lower) 
-                  for term in search_terms):
+        with plan.stage("scan_conditions") as stage:
+            matched = []
+            for generic_name, info in catalog.medicines.items():
+                conditions_lower = [c.lower() for c in info['conditions']]
+                if any(term in conditions_lower or 
+                      any(term in c for c in conditions_lower) 
+                      for term in search_terms):
+                    matched.append(generic_name)
+            stage["candidates_examined"] = len(catalog.medicines)
+            stage["matched"] = len(matched)
+        plan["candidates_examined"] = len(catalog.medicines)
+        
+        if plan:
+            with plan.stage("term_fanout") as stage:
+                stage["records_per_term"] = {
+                    term: sum(1 for info in catalog.medicines.values()
+                              if any(term in c.lower() for c in info['conditions']))
+                    for term in dict.fromkeys(search_terms)
+                }
+        
+        with plan.stage("materialize"):
+            for generic_name in matched:
                 result.append({
                     "generic_name": generic_name,
-                    **info
+                    **catalog.merged(generic_name)
                 })
+        if plan:
+            return result, plan.finish(len(result))
         return result
 
-    def search_by_category(self, category: str) -> List[Dict]:
+    @_timed_query
+    def search_by_category(self, category: str, explain: bool = False) -> List[Dict]:
         """
         Search for medicines by their category.
         
+        Every category whose name contains the query matches, together with
+        its subcategories. Each medicine is returned once.
+        
         Args:
             category: The category to search for (e.g., 'antibiotics', 'painkillers')
+            explain: Also return the query plan, see explain_query()
             
         Returns:
-            List of medicines in that category
+            List of medicines in that category, each with the first matching
+            "category" and all of its "categories", or a (results, plan)
+            tuple if explain is set
         """
+        catalog = self._catalog
+        plan = QueryPlan("search_by_category", category, catalog.generation) if explain else NO_PLAN
+        index = catalog.category_index
         category_lower = category.lower()
         result = []
         
-        # Find matching category
-        for cat, medicines in self._categories.items():
-            if category_lower in cat.lower():
-                # Get all medicines in this category
-                for medicine in medicines:
-                    if medicine in self._medicines:
-                        result.append({
-                            "generic_name": medicine,
-                            "category": cat,
-                            **self._medicines[medicine]
-                        })
+        plan["terms"] = [category_lower]
+        plan["access_path"] = "category_index"
+        with plan.stage("category_index") as stage:
+            found = index.search(category_lower)
+            if plan:
+                resolved = index.resolve(category_lower)
+                stage["categories_examined"] = len(index.names)
+                stage["categories_matched"] = list(resolved)
+                plan["candidates_examined"] = sum(len(index.members[cat]) for cat in resolved)
+            stage["matched"] = len(found)
+        
+        with plan.stage("materialize"):
+            for medicine, cat in found:
+                if medicine in catalog.medicines:
+                    result.append({
+                        "generic_name": medicine,
+                        "category": cat,
+                        "categories": list(index.categories_of(medicine)),
+                        **catalog.merged(medicine)
+                    })
+        if plan:
+            return result, plan.finish(len(result))
         return result
 
+    @_timed_query
     def get_all_categories(self) -> List[str]:
         """
         Get a list of all available medicine categories.
@@ -487,8 +1619,25 @@ class MedicineDatabase:
         Returns:
             List of category names
         """
-        return list(self._categories.keys())
+        return list(self._catalog.categories.keys())
 
+    @_timed_query
+    def get_medicine_categories(self, generic_name: str) -> List[str]:
+        """
+        Get the categories a medicine belongs to, including parent categories.
+        
+        Args:
+            generic_name: The generic name of the medicine
+            
+        Returns:
+            List of category names
+        """
+        catalog = self._catalog
+        if generic_name.lower() not in catalog.medicines:
+            return []
+        return list(catalog.category_index.categories_of(generic_name.lower()))
+
+    @_timed_query
     def get_medicine_info(self, generic_name: str) -> Optional[Dict]:
         """
         Get detailed information about a medicine by its generic name.
@@ -499,12 +1648,7 @@ class MedicineDatabase:
         Returns:
             Dictionary containing medicine information or None if not found
         """
-        if generic_name.lower() in self._medicines:
-            return {
-                "generic_name": generic_name.lower(),
-                **self._medicines[generic_name.lower()]
-            }
-        return None
+        return self._record(self._catalog, generic_name)
 
     def add_medicine(self, generic_name: str, uses: List[str], 
                     conditions: List[str], description: str) -> None:
@@ -516,56 +1660,166 @@ class MedicineDatabase:
             uses: List of uses for the medicine
             conditions: List of conditions the medicine treats
             description: Detailed description of the medicine
+            
+        Raises:
+            ValueError: If a field does not have the expected type
         """
-        self._medicines[generic_name.lower()] = {
+        record = {
             "uses": uses,
             "conditions": conditions,
             "description": description
         }
+        self._check_record(generic_name, record)
+        self._commit([(PUT, generic_name.lower(), record)])
+
+    def update_medicine(self, generic_name: str, **fields) -> None:
+        """
+        Update fields of an existing medicine.
+        
+        The new catalog version shares all other records with the current
+        one, so an update costs O(record size + log number of records).
+        
+        Args:
+            generic_name: The generic name of the medicine
+            fields: New field values; None reverts a field to its default
+            
+        Raises:
+            KeyError: If the medicine does not exist
+            ValueError: If a field does not have the expected type, or None
+                is given for a field without a default (uses, conditions,
+                description)
+        """
+        name = generic_name.lower()
+        with self._write_lock:
+            catalog = self._pending_catalog()
+            if name not in catalog.medicines:
+                raise KeyError(f"unknown medicine {generic_name!r}")
+            record = catalog.own_fields(name)
+            for key, value in fields.items():
+                if value is None:
+                    if key not in _DEFAULT_INFO:
+                        raise ValueError(f"{key!r} has no default to revert to")
+                    record.pop(key, None)
+                else:
+                    record[key] = value
+            self._check_record(generic_name, record)
+            self._strip_defaults([record])
+            self._commit([(PUT, name, record)])
 
-    def search_by_side_effect(self, side_effect: str) -> List[Dict]:
+    def delete_medicine(self, generic_name: str) -> bool:
+        """
+        Remove a medicine from the database.
+        
+        Args:
+            generic_name: The generic name of the medicine
+            
+        Returns:
+            True if the medicine existed
+        """
+        name = generic_name.lower()
+        with self._write_lock:
+            if name not in self._pending_catalog().medicines:
+                return False
+            self._commit([(DELETE, name, None)])
+            return True
+
+    @_timed_query
+    def search_by_side_effect(self, side_effect: str, explain: bool = False) -> List[Dict]:
         """
         Search for medicines by a specific side effect.
         
         Args:
             side_effect: The side effect to search for
+            explain: Also return the query plan, see explain_query()
             
         Returns:
-            List of medicines that may cause this side effect
+            List of medicines that may cause this side effect, or a
+            (results, plan) tuple if explain is set
         """
+        catalog = self._catalog
+        plan = QueryPlan("search_by_side_effect", side_effect, catalog.generation) if explain else NO_PLAN
         side_effect_lower = side_effect.lower()
         result = []
         
-        for generic_name, info in self._medicines.items():
-            if any(side_effect_lower in s.lower() for s in info.get('side_effects', [])):
+        plan["terms"] = [side_effect_lower]
+        plan["access_path"] = "full_scan"
+        with plan.stage("scan_side_effects") as stage:
+            # Records without their own side effects share one default answer
+            default_match = any(side_effect_lower in s.lower() for s in _DEFAULT_INFO['side_effects'])
+            matched = []
+            defaulted = 0
+            for generic_name, info in catalog.medicines.items():
+                if 'side_effects' in info:
+                    match = any(side_effect_lower in s.lower() for s in info['side_effects'])
+                else:
+                    match = default_match
+                    defaulted += 1
+                if match:
+                    matched.append(generic_name)
+            stage["candidates_examined"] = len(catalog.medicines) - defaulted
+            stage["answered_by_default"] = defaulted
+            stage["matched"] = len(matched)
+        plan["candidates_examined"] = len(catalog.medicines) - defaulted
+        
+        with plan.stage("materialize"):
+            for generic_name in matched:
                 result.append({
                     "generic_name": generic_name,
-                    **info
+                    **catalog.merged(generic_name)
                 })
+        if plan:
+            return result, plan.finish(len(result))
         return result
 
-    def search_by_form(self, form: str) -> List[Dict]:
+    @_timed_query
+    def search_by_form(self, form: str, explain: bool = False) -> List[Dict]:
         """
         Search for medicines by their form (tablet, syrup, etc.).
         
         Args:
             form: The form to search for
+            explain: Also return the query plan, see explain_query()
             
         Returns:
-            List of medicines available in that form
+            List of medicines available in that form, or a (results, plan)
+            tuple if explain is set
         """
+        catalog = self._catalog
+        plan = QueryPlan("search_by_form", form, catalog.generation) if explain else NO_PLAN
         form_lower = form.lower()
         result = []
         
-        for generic_name, info in self._medicines.items():
-            if 'dosage' in info and 'form' in info['dosage']:
-                if any(form_lower in f.lower() for f in info['dosage']['form']):
-                    result.append({
-                        "generic_name": generic_name,
-                        **info
-                    })
+        plan["terms"] = [form_lower]
+        plan["access_path"] = "full_scan"
+        with plan.stage("scan_forms") as stage:
+            # Records without their own dosage share one default answer
+            default_match = any(form_lower in f.lower() for f in _DEFAULT_INFO['dosage']['form'])
+            matched = []
+            defaulted = 0
+            for generic_name, info in catalog.medicines.items():
+                if 'dosage' not in info:
+                    match = default_match
+                    defaulted += 1
+                else:
+                    match = any(form_lower in f.lower() for f in info['dosage'].get('form', []))
+                if match:
+                    matched.append(generic_name)
+            stage["candidates_examined"] = len(catalog.medicines) - defaulted
+            stage["answered_by_default"] = defaulted
+            stage["matched"] = len(matched)
+        plan["candidates_examined"] = len(catalog.medicines) - defaulted
+        
+        with plan.stage("materialize"):
+            for generic_name in matched:
+                result.append({
+                    "generic_name": generic_name,
+                    **catalog.merged(generic_name)
+                })
+        if plan:
+            return result, plan.finish(len(result))
         return result
 
+    @_timed_query
     def get_contraindications(self, generic_name: str) -> List[str]:
         """
         Get contraindications for a specific medicine.
@@ -576,11 +1830,13 @@ class MedicineDatabase:
         Returns:
             List of contraindications
         """
-        info = self.get_medicine_info(generic_name)
-        if info and 'contraindications' in info:
-            return info['contraindications']
+        catalog = self._catalog
+        name = generic_name.lower()
+        if name in catalog.medicines:
+            return catalog.field(name, 'contraindications')
         return []
 
+    @_timed_query
     def get_dosage_info(self, generic_name: str) -> Optional[Dict]:
         """
         Get dosage information for a specific medicine.
@@ -591,11 +1847,47 @@ class MedicineDatabase:
         Returns:
             Dictionary containing dosage information or None if not found
         """
-        info = self.get_medicine_info(generic_name)
-        if info and 'dosage' in info:
-            return info['dosage']
+        catalog = self._catalog
+        name = generic_name.lower()
+        if name in catalog.medicines:
+            return catalog.field(name, 'dosage')
         return None
 
+    @_timed_query
+    def get_dosage_spec(self, generic_name: str) -> Optional[Dict]:
+        """
+        Get the structured adult dosage parsed from a medicine's dosage text.
+        
+        Args:
+            generic_name: The generic name of the medicine
+            
+        Returns:
+            Dictionary with min_dose, max_dose, unit, min/max_interval_hours,
+            max_daily_dose and max_doses_per_day, or None if the medicine is
+            unknown or its dosage text states no dose
+        """
+        spec = self._catalog.dosages.get(generic_name.lower())
+        return spec._asdict() if spec else None
+
+    @_timed_query
+    def validate_doses(self, orders: Iterable[Tuple[str, float, float]]) -> List[str]:
+        """
+        Validate a batch of dose orders against the structured dosage data.
+        
+        Args:
+            orders: (generic_name, dose, doses_per_day) tuples, with the dose in
+                the medicine's unit (mg for mass units)
+            
+        Returns:
+            One result per order: "ok", "dose_too_low", "dose_too_high",
+            "too_frequent", "daily_max_exceeded", "unknown_medicine",
+            "no_structured_dosage" or "invalid_order" (dose or frequency not a
+            finite positive number)
+        """
+        catalog = self._catalog
+        return _dosage.validate_doses(catalog.dosages, catalog.medicines, orders)
+
+    @_timed_query
     def get_pregnancy_safety(self, generic_name: str) -> Dict:
         """
         Get pregnancy safety information for a medicine.
@@ -606,15 +1898,17 @@ class MedicineDatabase:
         Returns:
             Dictionary containing pregnancy category and safety information
         """
-        info = self.get_medicine_info(generic_name)
+        catalog = self._catalog
+        info = self._record(catalog, generic_name)
         if info:
             return {
                 "category": info.get("pregnancy_category"),
-                "category_description": self._pregnancy_categories.get(info.get("pregnancy_category", ""), ""),
+                "category_description": catalog.pregnancy_categories.get(info.get("pregnancy_category", ""), ""),
                 "safety_info": info.get("pregnancy_safety")
             }
         return None
 
+    @_timed_query
     def get_lactation_safety(self, generic_name: str) -> Dict:
         """
         Get breastfeeding safety information for a medicine.
@@ -625,53 +1919,84 @@ class MedicineDatabase:
         Returns:
             Dictionary containing lactation category and safety information
         """
-        info = self.get_medicine_info(generic_name)
+        catalog = self._catalog
+        info = self._record(catalog, generic_name)
         if info:
             return {
                 "category": info.get("lactation_category"),
-                "category_description": self._lactation_categories.get(info.get("lactation_category", ""), ""),
+                "category_description": catalog.lactation_categories.get(info.get("lactation_category", ""), ""),
                 "safety_info": info.get("lactation_safety")
             }
         return None
 
-    def search_safe_in_pregnancy(self, category: str = "A") -> List[Dict]:
+    @_timed_query
+    def search_safe_in_pregnancy(self, category: str = "A",
+                                 explain: bool = False) -> List[Dict]:
         """
         Search for medicines that are safe during pregnancy by category.
         
         Args:
             category: The pregnancy category to search for (A, B, C, D, or X)
+            explain: Also return the query plan, see explain_query()
             
         Returns:
-            List of medicines in that pregnancy category
+            List of medicines in that pregnancy category, or a (results, plan)
+            tuple if explain is set
         """
+        catalog = self._catalog
+        plan = QueryPlan("search_safe_in_pregnancy", category, catalog.generation) if explain else NO_PLAN
         result = []
-        for generic_name, info in self._medicines.items():
-            if info.get("pregnancy_category", "") == category.upper():
+        plan["terms"] = [category.upper()]
+        plan["access_path"] = "full_scan"
+        plan["candidates_examined"] = len(catalog.medicines)
+        with plan.stage("scan_pregnancy_categories") as stage:
+            matched = [generic_name for generic_name in catalog.medicines
+                       if catalog.field(generic_name, "pregnancy_category") == category.upper()]
+            stage["matched"] = len(matched)
+        with plan.stage("materialize"):
+            for generic_name in matched:
                 result.append({
                     "generic_name": generic_name,
                     "pregnancy_category": category.upper(),
-                    "pregnancy_safety": info.get("pregnancy_safety"),
-                    "description": info.get("description")
+                    "pregnancy_safety": catalog.field(generic_name, "pregnancy_safety"),
+                    "description": catalog.field(generic_name, "description")
                 })
+        if plan:
+            return result, plan.finish(len(result))
         return result
 
-    def search_safe_in_lactation(self, category: str = "safe") -> List[Dict]:
+    @_timed_query
+    def search_safe_in_lactation(self, category: str = "safe",
+                                 explain: bool = False) -> List[Dict]:
         """
         Search for medicines that are safe during breastfeeding by category.
         
         Args:
             category: The lactation category to search for
+            explain: Also return the query plan, see explain_query()
             
         Returns:
-            List of medicines in that lactation category
+            List of medicines in that lactation category, or a (results, plan)
+            tuple if explain is set
         """
+        catalog = self._catalog
+        plan = QueryPlan("search_safe_in_lactation", category, catalog.generation) if explain else NO_PLAN
         result = []
-        for generic_name, info in self._medicines.items():
-            if info.get("lactation_category", "") == category.lower():
+        plan["terms"] = [category.lower()]
+        plan["access_path"] = "full_scan"
+        plan["candidates_examined"] = len(catalog.medicines)
+        with plan.stage("scan_lactation_categories") as stage:
+            matched = [generic_name for generic_name in catalog.medicines
+                       if catalog.field(generic_name, "lactation_category") == category.lower()]
+            stage["matched"] = len(matched)
+        with plan.stage("materialize"):
+            for generic_name in matched:
                 result.append({
                     "generic_name": generic_name,
                     "lactation_category": category.lower(),
-                    "lactation_safety": info.get("lactation_safety"),
-                    "description": info.get("description")
+                    "lactation_safety": catalog.field(generic_name, "lactation_safety"),
+                    "description": catalog.field(generic_name, "description")
                 })
+        if plan:
+            return result, plan.finish(len(result))
         return result
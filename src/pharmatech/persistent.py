@@ -0,0 +1,225 @@
+"""
+Persistent mapping for the per-record tables of a catalog version.
+
+A PersistentMap is immutable: set() and discard() return a new map sharing
+all but one path of a hash trie with the old one, so deriving the next
+catalog version from a single change costs O(log n) instead of a copy of
+every table. Iteration follows insertion order, like a dict.
+
+Maps built from a dict keep that dict for reads and only build their trie
+on the first change. A derived map builds an ordered dict on its first full
+scan, which costs no more than the scan itself, and answers every later read
+from it: usually by copying an ancestor's dict and replaying the few changes
+made since, else from the trie.
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+# Leaves holding more entries than this are split, until the hash runs out
+_LEAF_SIZE = 16
+_HASH_BITS = 64
+# Changes a derived map replays on an ancestor's ordered dict at most
+_MAX_REPLAY = 64
+
+# Trie nodes: a tuple of _WIDTH children, or a leaf dict mapping keys to
+# (insertion order, value)
+_Entry = Tuple[int, Any]
+_MISSING = object()
+
+
+def _split(leaf: Dict[Any, _Entry], shift: int) -> Any:
+    """Return a node holding the entries of leaf, split while too large."""
+    if len(leaf) <= _LEAF_SIZE or shift >= _HASH_BITS:
+        return leaf
+    children = [{} for _ in range(_WIDTH)]
+    for key, entry in leaf.items():
+        children[(hash(key) >> shift) & _MASK][key] = entry
+    return tuple(_split(child, shift + _BITS) for child in children)
+
+
+def _assoc(node: Any, digest: int, shift: int, key: Any, entry: _Entry) -> Any:
+    """Return a copy of node with key set, copying only the path to it."""
+    if type(node) is tuple:
+        index = (digest >> shift) & _MASK
+        children = list(node)
+        children[index] = _assoc(node[index], digest, shift + _BITS, key, entry)
+        return tuple(children)
+    leaf = dict(node)
+    leaf[key] = entry
+    return _split(leaf, shift)
+
+
+def _dissoc(node: Any, digest: int, shift: int, key: Any) -> Any:
+    """Return a copy of node without key, copying only the path to it."""
+    if type(node) is tuple:
+        index = (digest >> shift) & _MASK
+        child = _dissoc(node[index], digest, shift + _BITS, key)
+        if child is node[index]:
+            return node
+        children = list(node)
+        children[index] = child
+        return tuple(children)
+    if key not in node:
+        return node
+    leaf = dict(node)
+    del leaf[key]
+    return leaf
+
+
+class PersistentMap(Mapping):
+    """
+    Immutable mapping with cheap modified copies.
+
+    Args:
+        items: Initial contents, copied
+    """
+
+    __slots__ = ("_ordered", "_base", "_root", "_size", "_next_order")
+
+    def __init__(self, items: Any = ()):
+        self._ordered: Optional[Dict] = dict(items)
+        # (ordered dict of an ancestor, (key, value or _MISSING) changes since)
+        self._base: Optional[Tuple[Dict, Tuple[Tuple[Any, Any], ...]]] = None
+        self._root: Any = None
+        self._size = len(self._ordered)
+        self._next_order = self._size
+
+    @classmethod
+    def _adopt(cls, ordered: Dict) -> "PersistentMap":
+        """Wrap a dict nobody else holds, without copying it."""
+        new = cls.__new__(cls)
+        new._ordered = ordered
+        new._base = None
+        new._root = None
+        new._size = new._next_order = len(ordered)
+        return new
+
+    def _derive(self, root: Any, size: int, next_order: int, key: Any, value: Any) -> "PersistentMap":
+        """Return the map that results from setting (or, given _MISSING, removing) key."""
+        new = PersistentMap.__new__(PersistentMap)
+        new._ordered = None
+        new._root = root
+        new._size = size
+        new._next_order = next_order
+        # Read once each: a concurrent scan may be materializing this map
+        ordered, derived = self._ordered, self._base
+        if ordered is not None:
+            new._base = (ordered, ((key, value),))
+        elif derived is not None and len(derived[1]) < _MAX_REPLAY:
+            new._base = (derived[0], derived[1] + ((key, value),))
+        else:
+            new._base = None
+        return new
+
+    def __reduce__(self):
+        return PersistentMap._adopt, (self._items(),)
+
+    def _trie(self) -> Any:
+        """Return the trie, building it from the ordered dict on first use."""
+        if self._root is None:
+            self._root = _split({key: (order, value) for order, (key, value)
+                                 in enumerate(self._ordered.items())}, 0)
+        return self._root
+
+    def _items(self) -> Dict:
+        """Return the contents as a dict in insertion order, built on first use."""
+        ordered = self._ordered
+        if ordered is not None:
+            return ordered
+        # Concurrent readers may both get here; each reads _base only once
+        derived = self._base
+        if derived is not None:
+            # Dicts order keys the way the trie does: replacing a key keeps
+            # its position, (re)inserting one appends it
+            base, changes = derived
+            ordered = dict(base)
+            for key, value in changes:
+                if value is _MISSING:
+                    del ordered[key]
+                else:
+                    ordered[key] = value
+        else:
+            # Insertion orders are unique and below _next_order: place each
+            # entry in its slot rather than sorting
+            slots: List[Optional[Tuple[Any, Any]]] = [None] * self._next_order
+            nodes = [self._root]
+            while nodes:
+                node = nodes.pop()
+                if type(node) is tuple:
+                    nodes.extend(node)
+                else:
+                    for key, (order, value) in node.items():
+                        slots[order] = (key, value)
+            ordered = dict(filter(None, slots))
+        self._ordered = ordered
+        # Let the ancestor's dict go
+        self._base = None
+        return ordered
+
+    def _find(self, key: Any) -> Optional[_Entry]:
+        node = self._root
+        digest = hash(key)
+        shift = 0
+        while type(node) is tuple:
+            node = node[(digest >> shift) & _MASK]
+            shift += _BITS
+        return node.get(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        ordered = self._ordered
+        if ordered is not None:
+            return ordered.get(key, default)
+        entry = self._find(key)
+        return default if entry is None else entry[1]
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Any) -> bool:
+        ordered = self._ordered
+        if ordered is not None:
+            return key in ordered
+        return self._find(key) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        return iter(self._items())
+
+    def keys(self):
+        return self._items().keys()
+
+    def items(self):
+        return self._items().items()
+
+    def values(self):
+        return self._items().values()
+
+    def __repr__(self) -> str:
+        return f"PersistentMap({self._items()!r})"
+
+    def set(self, key: Any, value: Any) -> "PersistentMap":
+        """Return a map with key set to value; an existing key keeps its position."""
+        root = self._trie()
+        existing = self._find(key)
+        if existing is None:
+            order, size, next_order = self._next_order, self._size + 1, self._next_order + 1
+        else:
+            order, size, next_order = existing[0], self._size, self._next_order
+        return self._derive(_assoc(root, hash(key), 0, key, (order, value)),
+                            size, next_order, key, value)
+
+    def discard(self, key: Any) -> "PersistentMap":
+        """Return a map without key (this map if it has no such key)."""
+        root = self._trie()
+        if self._find(key) is None:
+            return self
+        return self._derive(_dissoc(root, hash(key), 0, key),
+                            self._size - 1, self._next_order, key, _MISSING)
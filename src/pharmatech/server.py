@@ -0,0 +1,312 @@
+"""
+Local HTTP/JSON query service for the PharmaTech catalog.
+
+Serves every PharmaTech query over HTTP/1.1 with keep-alive, handling each
+connection in its own thread. Responses are cached per catalog generation:
+records are serialized to JSON once per generation and their bytes reused in
+every response that contains them, and every response carries an ETag so
+clients can revalidate with a conditional GET.
+
+Run with ``python -m pharmatech.server --port 8000``.
+"""
+import argparse
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from . import PharmaTech
+from .changelog import ChangeLogTruncated
+from .medicine_db import MedicineDatabase
+from .storage import TieredStorage
+
+# Queries whose results are full medicine records, by URL path
+_RECORD_SEARCHES: Dict[str, Callable[[PharmaTech, str], List[Dict]]] = {
+    "/search/condition": PharmaTech.find_medicines_for_condition,
+    "/search/side-effect": PharmaTech.find_medicines_by_side_effect,
+    "/search/form": PharmaTech.find_medicines_by_form,
+}
+
+# Other queries that take a search term, by URL path
+_SEARCHES: Dict[str, Callable[[PharmaTech, str], object]] = {
+    "/search/category": PharmaTech.find_medicines_by_category,
+}
+
+# Per-medicine lookups, by the last URL path segment
+_MEDICINE_LOOKUPS: Dict[str, Callable[[PharmaTech, str], object]] = {
+    "categories": PharmaTech.get_medicine_categories,
+    "contraindications": PharmaTech.get_medicine_contraindications,
+    "dosage": PharmaTech.get_medicine_dosage,
+    "structured-dosage": PharmaTech.get_structured_dosage,
+    "pregnancy-safety": PharmaTech.get_pregnancy_safety,
+    "lactation-safety": PharmaTech.get_lactation_safety,
+}
+
+
+def _dumps(value: object) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class _NotFound(Exception):
+    pass
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class _ResponseCache:
+    """
+    Serialized responses and records for one catalog generation.
+
+    Responses are dropped as soon as a request sees a newer generation. Record
+    bytes are carried over, except for records the change log says changed.
+    """
+
+    def __init__(self, pharma: PharmaTech, max_entries: int):
+        self._pharma = pharma
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._seq = 0
+        self._responses: "OrderedDict[str, bytes]" = OrderedDict()
+        self._records: Dict[str, bytes] = {}
+
+    def _check_generation(self, version: Tuple[int, int]) -> None:
+        generation, seq = version
+        if self._generation is not None and generation <= self._generation:
+            return
+        # Fresh objects, so threads still serializing for the old
+        # generation cannot leak entries into the new one
+        records = {}
+        if self._generation is not None:
+            try:
+                changed = {change["generic_name"] for change in self._pharma.get_changes_since(self._seq)}
+            except ChangeLogTruncated:
+                changed = None
+            if changed is not None and None not in changed:
+                records = {name: body for name, body in self._records.items() if name not in changed}
+        self._generation = generation
+        self._seq = seq
+        self._responses = OrderedDict()
+        self._records = records
+
+    def get(self, version: Tuple[int, int], key: str) -> Optional[bytes]:
+        with self._lock:
+            self._check_generation(version)
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+            return body
+
+    def put(self, generation: int, key: str, body: bytes) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._responses[key] = body
+            if len(self._responses) > self._max_entries:
+                self._responses.popitem(last=False)
+
+    def records(self, version: Tuple[int, int], results: List[Dict]) -> bytes:
+        """Serialize a list of full records, reusing each record's bytes."""
+        with self._lock:
+            self._check_generation(version)
+            # Results computed on an older version must not enter the cache
+            cached = self._records if version[0] == self._generation else None
+        parts = []
+        serialized = {}
+        for record in results:
+            body = cached.get(record["generic_name"]) if cached is not None else None
+            if body is None:
+                body = serialized[record["generic_name"]] = _dumps(record)
+            parts.append(body)
+        if serialized and cached is not None:
+            # Inserted under the lock: _check_generation() iterates the dict
+            with self._lock:
+                if cached is self._records:
+                    cached.update(serialized)
+        return b"[" + b",".join(parts) + b"]"
+
+
+class PharmaTechServer(ThreadingHTTPServer):
+    """HTTP server answering PharmaTech queries for one PharmaTech instance."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], pharma: PharmaTech,
+                 cache_entries: int = 4096):
+        super().__init__(address, _Handler)
+        self.pharma = pharma
+        self.cache = _ResponseCache(pharma, cache_entries)
+        # Distinguishes ETags of equal generation numbers across restarts
+        self.instance_id = uuid.uuid4().hex[:12]
+
+    def etag(self, generation: int) -> str:
+        return f'"{self.instance_id}-{generation}"'
+
+    def render(self, version: Tuple[int, int], path: str, params: Dict[str, List[str]]) -> bytes:
+        """Run the query addressed by a GET request and serialize its result."""
+        pharma = self.pharma
+        generation = version[0]
+        term = params.get("q", [""])[0]
+        if path in _RECORD_SEARCHES:
+            return self.cache.records(version, _RECORD_SEARCHES[path](pharma, term))
+        if path in _SEARCHES:
+            return _dumps(_SEARCHES[path](pharma, term))
+        if path == "/categories":
+            return _dumps(pharma.get_available_categories())
+        if path == "/pregnancy-safe":
+            return _dumps(pharma.find_pregnancy_safe_medicines(params.get("category", ["A"])[0]))
+        if path == "/breastfeeding-safe":
+            return _dumps(pharma.find_breastfeeding_safe_medicines(params.get("category", ["safe"])[0]))
+        if path == "/health":
+            return _dumps({"status": "ok", "generation": generation})
+        if path == "/changes":
+            try:
+                since = int(params.get("since", ["0"])[0])
+            except ValueError:
+                raise _BadRequest("since must be an integer") from None
+            return _dumps({"seq": version[1], "changes": pharma.get_changes_since(since)})
+
+        parts = path.strip("/").split("/")
+        if parts[0] == "medicines" and len(parts) == 2:
+            record = pharma.get_medicine_details(unquote(parts[1]))
+            if record is None:
+                raise _NotFound(f"medicine {unquote(parts[1])!r} not found")
+            return self.cache.records(version, [record])[1:-1]
+        if parts[0] == "medicines" and len(parts) == 3 and parts[2] in _MEDICINE_LOOKUPS:
+            if pharma.get_medicine_details(unquote(parts[1])) is None:
+                raise _NotFound(f"medicine {unquote(parts[1])!r} not found")
+            return _dumps(_MEDICINE_LOOKUPS[parts[2]](pharma, unquote(parts[1])))
+        raise _NotFound(f"no route for {path!r}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+    server: PharmaTechServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send(status, _dumps({"error": message}))
+
+    def do_GET(self):
+        server = self.server
+        version = server.pharma.catalog_version
+        generation = version[0]
+        etag = server.etag(generation)
+        body = server.cache.get(version, self.path)
+        if body is None:
+            url = urlsplit(self.path)
+            try:
+                body = server.render(version, url.path.rstrip("/") or "/", parse_qs(url.query))
+            except _NotFound as exc:
+                self._error(HTTPStatus.NOT_FOUND, str(exc))
+                return
+            except _BadRequest as exc:
+                self._error(HTTPStatus.BAD_REQUEST, str(exc))
+                return
+            except ChangeLogTruncated as exc:
+                self._error(HTTPStatus.GONE, str(exc))
+                return
+            server.cache.put(generation, self.path, body)
+        # Only a successful response carries the ETag, so routing and
+        # lookups have to succeed before a 304 can be sent
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(HTTPStatus.OK, body, etag)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip("/") != "/validate-doses":
+            self._error(HTTPStatus.NOT_FOUND, f"no route for {self.path!r}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # The body cannot be delimited, so the connection cannot be reused
+            self.close_connection = True
+            self._error(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+            return
+        try:
+            orders = json.loads(self.rfile.read(length) or b"[]")
+            results = self.server.pharma.validate_doses(
+                (str(name), float(dose), float(frequency)) for name, dose, frequency in orders)
+        except (TypeError, ValueError) as exc:
+            self._error(HTTPStatus.BAD_REQUEST,
+                        f"expected a JSON list of [generic_name, dose, doses_per_day]: {exc}")
+            return
+        self._send(HTTPStatus.OK, _dumps(results))
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000,
+          pharma: Optional[PharmaTech] = None) -> PharmaTechServer:
+    """
+    Create a server bound to host:port; call serve_forever() to run it.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 for any free port
+        pharma: PharmaTech instance to serve, defaults to the built-in catalog
+
+    Returns:
+        The bound server
+    """
+    return PharmaTechServer((host, port), pharma if pharma is not None else PharmaTech())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve PharmaTech queries over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--catalog", help="JSON catalog file to serve instead of the built-in one")
+    parser.add_argument("--poll-interval", type=float,
+                        help="reload the catalog file this many seconds after it changes")
+    parser.add_argument("--snapshot", help="snapshot file to start from")
+    parser.add_argument("--cold-cache-bytes", type=int,
+                        help="keep bulky text fields on disk behind a cache of this many bytes")
+    args = parser.parse_args(argv)
+
+    tiered = TieredStorage(cache_bytes=args.cold_cache_bytes) if args.cold_cache_bytes else None
+    if args.snapshot:
+        db = MedicineDatabase.load_snapshot(args.snapshot, args.catalog, args.poll_interval, tiered)
+    else:
+        db = MedicineDatabase(args.catalog, args.poll_interval, tiered)
+    server = serve(args.host, args.port, PharmaTech(db))
+    print(f"Serving PharmaTech on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Snapshot serialization for a fully built medicine database.
+
+A snapshot is a single binary file made of a fixed-size header followed by a
+pickled payload and an optional blob of opaque data, such as the compressed
+blocks of tiered storage, which is streamed in and out rather than held in
+memory. The header records the snapshot format version, a fingerprint of the
+code that produced the catalog and a SHA-256 checksum of the payload and blob,
+so a stale or corrupt snapshot is detected before anything is unpickled.
+
+Snapshots are a cache of trusted, locally built state. Only load snapshot files
+written by this library on a machine you control.
+"""
+import contextlib
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional
+
+MAGIC = b"PHMSNAP\x00"
+FORMAT_VERSION = 2
+
+# magic, format version, source fingerprint, checksum, payload length, blob length
+_HEADER = struct.Struct("<8sH32s32sQQ")
+_CHUNK_SIZE = 1 << 16
+
+# Module generated at wheel build time holding the code fingerprint
+BUILD_MODULE = "_build.py"
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, stale or corrupt."""
+
+
+def source_fingerprint(*paths: str, extra: Iterable[str] = ()) -> bytes:
+    """
+    Compute a fingerprint of the code that builds the catalog.
+
+    Args:
+        paths: Source files whose contents define the built state
+        extra: Additional strings to mix in (e.g. the package version)
+
+    Returns:
+        32-byte SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(str(FORMAT_VERSION).encode())
+    for value in extra:
+        digest.update(value.encode())
+    for path in paths:
+        with open(path, "rb") as handle:
+            digest.update(handle.read())
+    return digest.digest()
+
+
+def file_digest(path: str) -> bytes:
+    """
+    Compute the SHA-256 digest of a file's contents.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        32-byte SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def package_sources(directory: str) -> List[str]:
+    """
+    List the modules of a package that a code fingerprint covers.
+
+    Args:
+        directory: Package directory
+
+    Returns:
+        Sorted paths of its Python modules, excluding the generated one
+    """
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(".py") and name != BUILD_MODULE)
+
+
+def write_snapshot(path: str, state: Any, fingerprint: bytes,
+                   blob: Iterable[bytes] = ()) -> None:
+    """
+    Write a snapshot atomically.
+
+    Args:
+        path: Destination file path
+        state: Picklable state to persist
+        fingerprint: Fingerprint returned by source_fingerprint()
+        blob: Chunks of data to store after the state, written as they come
+    """
+    payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    checksum = hashlib.sha256(payload)
+    with _atomic_file(path) as handle:
+        # The header is filled in once the blob has been written
+        handle.write(bytes(_HEADER.size))
+        handle.write(payload)
+        blob_length = 0
+        for chunk in blob:
+            handle.write(chunk)
+            checksum.update(chunk)
+            blob_length += len(chunk)
+        handle.seek(0)
+        handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION, fingerprint, checksum.digest(),
+                                  len(payload), blob_length))
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """
+    Write a file atomically.
+
+    The data is written next to its destination and renamed into place, so
+    concurrent readers see either the old contents or the new ones.
+
+    Args:
+        path: Destination file path
+        data: File contents
+    """
+    with _atomic_file(path) as handle:
+        handle.write(data)
+
+
+@contextlib.contextmanager
+def _atomic_file(path: str) -> Iterator[BinaryIO]:
+    """Open a temporary file that replaces path if the block completes."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pharmatech-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            yield handle
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: str, fingerprint: bytes,
+                  blob: Optional[Callable[[bytes], Any]] = None) -> Any:
+    """
+    Read and validate a snapshot.
+
+    Args:
+        path: Snapshot file path
+        fingerprint: Fingerprint the snapshot must have been written with
+        blob: Called with successive chunks of the data stored after the
+            state; they are only known to be intact once this returns
+
+    Returns:
+        The persisted state
+
+    Raises:
+        SnapshotError: If the file is missing, from another format version or
+            code revision, truncated, or fails its checksum
+    """
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise SnapshotError("snapshot is truncated")
+            magic, version, stored_fingerprint, checksum, length, blob_length = \
+                _HEADER.unpack(header)
+            if magic != MAGIC:
+                raise SnapshotError("not a pharmatech snapshot")
+            if version != FORMAT_VERSION:
+                raise SnapshotError(f"unsupported snapshot format version {version}")
+            if stored_fingerprint != fingerprint:
+                raise SnapshotError("snapshot is stale")
+
+            payload = handle.read(length)
+            if len(payload) != length:
+                raise SnapshotError("snapshot is truncated")
+            digest = hashlib.sha256(payload)
+            remaining = blob_length
+            while remaining:
+                chunk = handle.read(min(remaining, _CHUNK_SIZE))
+                if not chunk:
+                    raise SnapshotError("snapshot is truncated")
+                digest.update(chunk)
+                remaining -= len(chunk)
+                if blob is not None:
+                    blob(chunk)
+            if handle.read(1):
+                raise SnapshotError("snapshot is longer than its header says")
+    except OSError as exc:
+        raise SnapshotError(f"cannot read snapshot {path!r}: {exc}") from exc
+
+    if digest.digest() != checksum:
+        raise SnapshotError("snapshot checksum mismatch")
+    try:
+        return pickle.loads(payload)
+    except Exception as exc:
+        raise SnapshotError(f"cannot decode snapshot: {exc}") from exc
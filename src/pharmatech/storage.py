@@ -0,0 +1,165 @@
+"""
+Tiered record storage.
+
+Bulky text fields of medicine records can be moved out of memory into a
+BlockStore, an append-only temporary file of zlib-compressed JSON blocks.
+Decoded blocks are kept in a RecordCache, an LRU bounded by bytes, so memory
+use for these fields stays under a fixed limit however large the catalog is.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Location of a block in a BlockStore: (offset, compressed length)
+BlockRef = Tuple[int, int]
+
+_pread = getattr(os, "pread", None)
+
+
+class TieredStorage:
+    """
+    Settings of the tiered storage mode.
+
+    Args:
+        directory: Directory for block store files, default the system
+            temporary directory
+        cache_bytes: Upper bound on decoded cold fields kept in memory
+    """
+
+    def __init__(self, directory: Optional[str] = None, cache_bytes: int = 4 * 1024 * 1024):
+        self.directory = directory
+        self.cache_bytes = cache_bytes
+
+
+class BlockStore:
+    """
+    Append-only store of compressed JSON blocks in an anonymous temporary file.
+
+    The file is deleted by the OS when the store is closed or garbage
+    collected, so each catalog version can own one without cleanup.
+    """
+
+    def __init__(self, directory: Optional[str] = None, level: int = 6):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._level = level
+        self._lock = threading.Lock()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Bytes written to the store so far."""
+        return self._size
+
+    def put(self, value: Any) -> BlockRef:
+        """Compress and append a JSON-serializable value."""
+        return self.append(zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"),
+                                         self._level))
+
+    def append(self, data: bytes) -> BlockRef:
+        """Append compressed bytes as they are, e.g. blocks copied from another store."""
+        with self._lock:
+            offset = self._size
+            self._file.seek(offset)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+        return offset, len(data)
+
+    def get(self, ref: BlockRef) -> Any:
+        """Read and decode a block written by put()."""
+        return json.loads(self.read(ref))
+
+    def read(self, ref: BlockRef) -> bytes:
+        """Read a block written by put() as uncompressed JSON bytes."""
+        return zlib.decompress(self.read_raw(ref))
+
+    def read_raw(self, ref: BlockRef) -> bytes:
+        """Read a block as stored, compressed."""
+        offset, length = ref
+        if _pread is not None:
+            return _pread(self._file.fileno(), length, offset)
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def value_size(value: Any) -> int:
+    """
+    Approximate the memory held by a decoded JSON-like value.
+
+    Counts the value and everything it contains, including a frozen
+    mapping's underlying dict; strings shared between values are counted
+    each time, so the result errs on the high side.
+    """
+    kind = type(value)
+    size = sys.getsizeof(value)
+    if kind is list or kind is tuple:
+        size += sum(value_size(item) for item in value)
+    elif kind is dict or kind is MappingProxyType:
+        if kind is MappingProxyType:
+            size += sys.getsizeof(dict(value))
+        size += sum(sys.getsizeof(key) + value_size(item) for key, item in value.items())
+    return size
+
+
+class RecordCache:
+    """Thread-safe LRU of decoded values, bounded by their approximate size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable[[], Tuple[Any, int]]) -> Any:
+        """
+        Return the cached value for key, loading and caching it on a miss.
+
+        Args:
+            key: Cache key
+            load: Returns (value, size in bytes) for a missing key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value, size = load()
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted
+        return value
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,167 @@
+"""Test suite for catalog mutations and the change log."""
+import json
+import threading
+import pytest
+from pharmatech.changelog import Change, ChangeLog, ChangeLogTruncated
+from pharmatech.medicine_db import MedicineDatabase
+
+def test_update_and_delete_medicine():
+    db = MedicineDatabase()
+    db.update_medicine("paracetamol", description="Acetaminophen", side_effects=None)
+    info = db.get_medicine_info("paracetamol")
+    assert info["description"] == "Acetaminophen"
+    assert info["side_effects"] == db.get_medicine_info("amoxicillin")["side_effects"]
+    assert "fever" in info["conditions"]
+    with pytest.raises(KeyError):
+        db.update_medicine("nonexistentmedicine", description="x")
+    with pytest.raises(ValueError, match="no default"):
+        db.update_medicine("ibuprofen", conditions=None)
+    assert db.search_by_condition("fever")
+
+    assert db.delete_medicine("ibuprofen")
+    assert not db.delete_medicine("ibuprofen")
+    assert db.get_medicine_info("ibuprofen") is None
+    assert "ibuprofen" not in [m["generic_name"] for m in db.search_by_category("painkillers")]
+    assert db.get_medicine_categories("ibuprofen") == []
+
+def test_mutations_leave_earlier_versions_intact():
+    db = MedicineDatabase()
+    old = db._catalog
+    names = list(old.medicines)
+    for i in range(100):
+        db.update_medicine("paracetamol", description=f"revision {i}")
+    db.delete_medicine("ibuprofen")
+    db.add_medicine("aspirin", uses=[], conditions=["fever"], description="")
+    assert list(old.medicines) == names
+    assert old.merged("paracetamol") == MedicineDatabase()._catalog.merged("paracetamol")
+    assert "ibuprofen" in old.medicines and "aspirin" not in old.medicines
+    expected = [name for name in names if name != "ibuprofen"] + ["aspirin"]
+    assert list(db._catalog.medicines) == expected
+    assert db.get_medicine_info("paracetamol")["description"] == "revision 99"
+
+def test_changes_since_and_replay():
+    primary = MedicineDatabase()
+    replica = MedicineDatabase()
+    seen = []
+    primary.subscribe(seen.extend)
+
+    primary.add_medicine("aspirin", ["pain relief"], ["headache"], "Salicylate")
+    primary.update_medicine("paracetamol", dosage={"adult": "1 g every 6 hours (max 4 g/day)",
+                                                   "child": "Consult physician", "form": ["tablet"]})
+    primary.delete_medicine("metformin")
+    changes = primary.changes_since(0)
+    assert [c["seq"] for c in changes] == [1, 2, 3]
+    assert [c["op"] for c in changes] == ["put", "put", "delete"]
+    assert seen == changes
+    assert primary.changes_since(2) == changes[2:]
+
+    # Changes survive a trip through JSON, as they would between processes
+    assert replica.apply_changes(json.loads(json.dumps(changes[:2]))) == 2
+    assert replica.apply_changes(changes) == 1
+    assert replica.change_seq == primary.change_seq == 3
+    for name in ["aspirin", "paracetamol", "metformin"]:
+        assert replica.get_medicine_info(name) == primary.get_medicine_info(name)
+    assert replica.get_dosage_spec("paracetamol")["max_daily_dose"] == 4000
+
+def test_apply_changes_rejects_gaps():
+    primary = MedicineDatabase()
+    primary.delete_medicine("metformin")
+    primary.delete_medicine("insulin")
+    with pytest.raises(ValueError, match="missing changes"):
+        MedicineDatabase().apply_changes(primary.changes_since(1))
+
+def test_batch_publishes_one_version():
+    db = MedicineDatabase()
+    seen = []
+    db.subscribe(seen.append)
+    generation = db.generation
+    with db.batch():
+        db.update_medicine("paracetamol", description="Acetaminophen")
+        db.update_medicine("paracetamol", uses=["fever reduction"])
+        assert db.delete_medicine("metformin")
+        assert not db.delete_medicine("metformin")
+        assert db.get_medicine_info("metformin") is not None
+    assert db.generation == generation + 1
+    assert [[c["seq"] for c in batch] for batch in seen] == [[1, 2, 3]]
+    info = db.get_medicine_info("paracetamol")
+    assert (info["description"], info["uses"]) == ("Acetaminophen", ["fever reduction"])
+    assert db.get_medicine_info("metformin") is None
+
+    with pytest.raises(RuntimeError):
+        with db.batch():
+            db.delete_medicine("insulin")
+            raise RuntimeError("abort")
+    assert db.get_medicine_info("insulin") is not None
+    assert db.change_seq == 3
+
+def test_invalid_mutations_are_rejected():
+    db = MedicineDatabase()
+    with pytest.raises(ValueError):
+        db.update_medicine("paracetamol", conditions="fever")
+    with pytest.raises(ValueError):
+        db.add_medicine("aspirin", uses="pain", conditions=[], description="")
+    with db.batch():
+        with pytest.raises(ValueError):
+            db.update_medicine("paracetamol", dosage="500 mg")
+        assert db.delete_medicine("metformin")
+    assert db.get_medicine_info("paracetamol") == MedicineDatabase().get_medicine_info("paracetamol")
+    assert [c["op"] for c in db.changes_since(0)] == ["delete"]
+    assert db.search_by_form("tablet")
+
+    replica = MedicineDatabase()
+    bad = [{"seq": 1, "op": "delete", "generic_name": "insulin", "record": None},
+           {"seq": 2, "op": "put", "generic_name": "aspirin", "record": {"uses": []}}]
+    with pytest.raises(ValueError):
+        replica.apply_changes(bad)
+    assert replica.change_seq == 0
+    assert replica.get_medicine_info("insulin") is not None
+
+def test_concurrent_replays_apply_once():
+    primary = MedicineDatabase()
+    for name in ["metformin", "insulin", "warfarin"]:
+        primary.delete_medicine(name)
+    changes = primary.changes_since(0)
+    replica = MedicineDatabase()
+    barrier = threading.Barrier(4)
+    applied = []
+
+    def replay():
+        barrier.wait()
+        applied.append(replica.apply_changes(changes))
+
+    threads = [threading.Thread(target=replay) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(applied) == [0, 0, 0, 3]
+    assert replica.version == (2, 3)
+
+def test_reload_records_differences(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"medicines": {"aspirin": {"conditions": ["headache"]},
+                                              "naproxen": {"conditions": ["back pain"]}}}))
+    db = MedicineDatabase(catalog_path=str(path))
+    path.write_text(json.dumps({"medicines": {"aspirin": {"conditions": ["headache", "fever"]}},
+                                "category_parents": {}}))
+    assert db.reload()
+    changes = db.changes_since(0)
+    assert [(c["op"], c["generic_name"]) for c in changes] == [
+        ("sections", None), ("put", "aspirin"), ("delete", "naproxen")]
+
+def test_change_log_truncation():
+    log = ChangeLog(max_entries=2)
+    log.append(Change(seq, "delete", str(seq), None) for seq in range(1, 6))
+    assert [c.seq for c in log.since(3)] == [4, 5]
+    with pytest.raises(ChangeLogTruncated):
+        log.since(0)
+
+def test_snapshot_keeps_change_sequence(tmp_path):
+    db = MedicineDatabase()
+    db.delete_medicine("metformin")
+    path = str(tmp_path / "catalog.snap")
+    db.save_snapshot(path)
+    loaded = MedicineDatabase.load_snapshot(path)
+    assert loaded.change_seq == 1
+    db.delete_medicine("insulin")
+    assert loaded.apply_changes(db.changes_since(loaded.change_seq)) == 1
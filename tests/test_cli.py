@@ -0,0 +1,45 @@
+"""Test suite for the command line interface."""
+import io
+import json
+import pytest
+from pharmatech.cli import main, run_batch
+
+QUERIES = [
+    {"id": 1, "query": "condition", "term": "fever"},
+    {"id": 2, "query": "pregnancy_safety", "term": "ibuprofen"},
+    {"id": 3, "query": "validate_doses", "orders": [["paracetamol", 500, 4]]},
+    {"id": 4, "query": "nonexistent"},
+    {"id": 5, "query": "details"},
+]
+
+def _lines(n=1):
+    return [json.dumps(q) + "\n" for q in QUERIES] * n
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch(workers):
+    out = io.StringIO()
+    count = run_batch(_lines(20), out, workers=workers, chunk_size=3)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == len(results) == 100
+    assert [r["id"] for r in results] == [q["id"] for q in QUERIES] * 20
+    assert "paracetamol" in [m["generic_name"] for m in results[0]["result"]]
+    assert results[1]["result"]["category"] == "C"
+    assert results[2]["result"] == ["ok"]
+    assert "unknown query" in results[3]["error"]
+    assert "missing field" in results[4]["error"]
+
+def test_run_batch_unordered():
+    out = io.StringIO()
+    run_batch(_lines(20), out, workers=2, chunk_size=3, ordered=False)
+    ids = sorted(json.loads(line)["id"] for line in out.getvalue().splitlines())
+    assert ids == sorted([q["id"] for q in QUERIES] * 20)
+
+def test_main_reads_file(tmp_path, capsys):
+    path = tmp_path / "queries.jsonl"
+    path.write_text("".join(_lines()) + "not json\n")
+    assert main(["batch", "-j", "1", str(path)]) == 0
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert len(lines) == 6
+    assert "error" in json.loads(lines[-1])
+    assert "6 queries" in captured.err
@@ -0,0 +1,48 @@
+"""Test suite for structured dosage data."""
+from pharmatech.dosage import parse_dosage
+from pharmatech.medicine_db import MedicineDatabase
+
+def test_parse_dosage():
+    spec = parse_dosage("500-1000 mg every 4-6 hours as needed (max 4000 mg/day)")
+    assert (spec.min_dose, spec.max_dose, spec.unit) == (500, 1000, "mg")
+    assert (spec.min_interval_hours, spec.max_interval_hours) == (4, 6)
+    assert spec.max_daily_dose == 4000
+    assert spec.max_doses_per_day == 6
+
+def test_parse_dosage_units_and_frequency():
+    spec = parse_dosage("250 mcg twice daily (max 1 mg/day)")
+    assert spec.min_dose == 0.25
+    assert spec.max_daily_dose == 1
+    assert spec.max_doses_per_day == 2
+    assert parse_dosage("Consult physician for proper dosing") is None
+
+def test_parse_dosage_skips_per_body_doses():
+    assert parse_dosage("10-15 mg/kg every 4-6 hours") is None
+    assert parse_dosage("75 mg per m2 every 3 weeks") is None
+
+def test_validate_doses():
+    db = MedicineDatabase()
+    results = db.validate_doses([
+        ("paracetamol", 500, 4),
+        ("Paracetamol", 1000, 6),
+        ("paracetamol", 2000, 1),
+        ("paracetamol", 250, 1),
+        ("paracetamol", 500, 8),
+        ("ibuprofen", 400, 3),
+        ("nonexistentmedicine", 1, 1),
+    ])
+    assert results == ["ok", "daily_max_exceeded", "dose_too_high", "dose_too_low",
+                       "too_frequent", "no_structured_dosage", "unknown_medicine"]
+
+def test_validate_doses_rejects_invalid_orders():
+    db = MedicineDatabase()
+    nan, inf = float("nan"), float("inf")
+    results = db.validate_doses([
+        ("paracetamol", nan, 4),
+        ("paracetamol", 500, nan),
+        ("paracetamol", 500, -3),
+        ("paracetamol", 0, 4),
+        ("paracetamol", inf, 1),
+        ("nonexistentmedicine", nan, 1),
+    ])
+    assert results == ["invalid_order"] * 6
@@ -31,3 +31,59 @@ def test_medicine_not_found():
     db = MedicineDatabase()
     info = db.get_medicine_info("nonexistentmedicine")
     assert info is None
+
+def test_added_medicine_gets_default_fields():
+    db = MedicineDatabase()
+    db.add_medicine("aspirin", uses=["pain relief"], conditions=["headache"],
+                    description="Salicylate pain reliever")
+    assert db.get_dosage_info("aspirin") == db.get_dosage_info("amoxicillin")
+    assert db.get_contraindications("aspirin")
+    assert db.get_pregnancy_safety("aspirin")["category"] == "C"
+
+def test_defaults_are_not_shared_between_records():
+    db = MedicineDatabase()
+    db.get_contraindications("amoxicillin").append("Mutated")
+    db.get_medicine_info("metformin")["side_effects"].clear()
+    db.get_dosage_info("amoxicillin")["form"].append("mutated")
+    assert "Mutated" not in db.get_contraindications("ibuprofen")
+    assert db.get_medicine_info("metformin")["side_effects"]
+    assert "mutated" not in db.get_dosage_info("ibuprofen")["form"]
+
+def test_records_are_not_shared_with_callers():
+    db = MedicineDatabase()
+    before = db.get_medicine_info("paracetamol")
+    db.get_medicine_info("paracetamol")["conditions"].append("MUTATED")
+    db.get_dosage_info("paracetamol")["adult"] = "MUTATED"
+    db.get_contraindications("paracetamol").append("MUTATED")
+    db.update_medicine("paracetamol", uses=["pain relief"])
+    db.get_medicine_info("paracetamol")["conditions"].append("MUTATED")
+    assert db.get_medicine_info("paracetamol") == dict(before, uses=["pain relief"])
+
+def test_search_by_category_deduplicates():
+    db = MedicineDatabase()
+    names = [med["generic_name"] for med in db.search_by_category("anti")]
+    assert len(names) == len(set(names))
+    assert "ibuprofen" in names
+
+def test_category_hierarchy():
+    db = MedicineDatabase()
+    assert db.get_medicine_categories("ibuprofen") == ["painkillers", "anti_inflammatory"]
+    assert db.get_medicine_categories("omeprazole") == ["stomach", "antacids"]
+    stomach = {med["generic_name"]: med for med in db.search_by_category("stomach")}
+    assert "omeprazole" in stomach
+    assert "antacids" in stomach["omeprazole"]["categories"]
+
+def test_explain_query():
+    db = MedicineDatabase()
+    results, plan = db.search_by_condition("pain", explain=True)
+    assert results == db.search_by_condition("pain")
+    assert "chronic pain" in plan["terms"] and "acute pain" in plan["terms"]
+    assert plan["access_path"] == "full_scan"
+    assert plan["candidates_examined"] >= plan["returned"] == len(results)
+    assert [stage["name"] for stage in plan["stages"]][0] == "expand_aliases"
+    assert plan["stages"][0]["aliases_matched"]["pain"] == 3
+
+    plan = db.explain_query("search_by_category", "stomach")
+    assert plan["access_path"] == "category_index"
+    with pytest.raises(ValueError):
+        db.explain_query("add_medicine", "x")
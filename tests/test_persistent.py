@@ -0,0 +1,36 @@
+"""Test suite for the persistent map behind catalog tables."""
+import pickle
+import random
+from pharmatech.persistent import PersistentMap
+
+def test_matches_dict_and_keeps_old_versions():
+    rng = random.Random(7)
+    model = {f"medicine_{i}": i for i in range(200)}
+    current = PersistentMap(model)
+    versions = [(current, dict(model))]
+    for step in range(2000):
+        key = f"medicine_{rng.randrange(300)}"
+        if rng.random() < 0.3:
+            current = current.discard(key)
+            model.pop(key, None)
+        else:
+            current = current.set(key, step)
+            model[key] = step
+        if step % 100 == 0:
+            versions.append((current, dict(model)))
+        assert current.get(key) == model.get(key)
+    for version, expected in versions:
+        assert len(version) == len(expected)
+        assert list(version.items()) == list(expected.items())
+        assert all(version[key] == value for key, value in expected.items())
+
+def test_discard_missing_key_returns_same_map():
+    table = PersistentMap({"a": 1}).set("b", 2)
+    assert table.discard("c") is table
+    assert "c" not in table and "b" in table
+
+def test_pickle_round_trip():
+    table = PersistentMap({"a": 1, "b": 2}).set("c", 3).discard("a")
+    loaded = pickle.loads(pickle.dumps(table))
+    assert list(loaded.items()) == [("b", 2), ("c", 3)]
+    assert list(loaded.set("a", 4)) == ["b", "c", "a"]
@@ -1,7 +1,19 @@
 """Test suite for the pharmatech package."""
+import subprocess
+import sys
 import pytest
 from pharmatech import __version__
 
 def test_version():
     """Test version is a string."""
     assert isinstance(__version__, str)
+
+def test_default_instance_is_created_on_first_use():
+    # Importing the package must not build a catalog
+    check = "import pharmatech; assert 'pharma' not in vars(pharmatech)"
+    subprocess.run([sys.executable, "-c", check], check=True)
+    import pharmatech
+    assert pharmatech.pharma is pharmatech.pharma
+    assert pharmatech.pharma.get_medicine_details("paracetamol") is not None
+    with pytest.raises(AttributeError):
+        pharmatech.nonexistent
@@ -0,0 +1,113 @@
+"""Test suite for catalog files and hot reload."""
+import json
+import time
+from pharmatech import PharmaTech
+from pharmatech.medicine_db import MedicineDatabase
+
+def _write_catalog(path, medicines):
+    path.write_text(json.dumps({"medicines": medicines}))
+
+def test_export_and_load_catalog_file(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    MedicineDatabase().export_catalog(path)
+    db = MedicineDatabase(catalog_path=path)
+    assert db.get_medicine_info("paracetamol") == MedicineDatabase().get_medicine_info("paracetamol")
+
+def test_reload_swaps_catalog(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write_catalog(path, {"aspirin": {"conditions": ["headache"]}})
+    db = MedicineDatabase(catalog_path=str(path))
+    assert [m["generic_name"] for m in db.search_by_condition("headache")] == ["aspirin"]
+    generation = db.generation
+
+    _write_catalog(path, {"naproxen": {"conditions": ["headache"]}})
+    assert db.reload()
+    assert [m["generic_name"] for m in db.search_by_condition("headache")] == ["naproxen"]
+    assert db.generation == generation + 1
+    assert db.reload_stats()["reloads"] == 1
+
+def test_invalid_catalog_keeps_old_version(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write_catalog(path, {"aspirin": {"conditions": ["headache"]}})
+    db = MedicineDatabase(catalog_path=str(path))
+    path.write_text("{not json")
+    assert not db.reload()
+    assert db.get_medicine_info("aspirin") is not None
+    stats = db.reload_stats()
+    assert stats["failed_reloads"] == 1
+    assert stats["last_error"]
+
+def test_watcher_picks_up_changes(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write_catalog(path, {"aspirin": {"conditions": ["headache"]}})
+    db = MedicineDatabase(catalog_path=str(path), poll_interval=0.01)
+    try:
+        _write_catalog(path, {"aspirin": {"conditions": ["headache"]},
+                              "naproxen": {"conditions": ["back pain"]}})
+        deadline = time.monotonic() + 5
+        while db.get_medicine_info("naproxen") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert db.get_medicine_info("naproxen") is not None
+    finally:
+        db.stop_watching()
+
+def test_pharmatech_uses_given_database(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write_catalog(path, {"aspirin": {"conditions": ["headache"]}})
+    pharma = PharmaTech(MedicineDatabase(catalog_path=str(path)))
+    assert pharma.get_medicine_details("paracetamol") is None
+    assert pharma.get_medicine_details("aspirin")["lactation_category"] == "caution"
+
+def test_watcher_survives_malformed_entry(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write_catalog(path, {"aspirin": {"conditions": ["headache"]}})
+    db = MedicineDatabase(catalog_path=str(path), poll_interval=0.01)
+    try:
+        _write_catalog(path, {"aspirin": {"conditions": ["headache"], "dosage": "500 mg"}})
+        deadline = time.monotonic() + 5
+        while "dosage" not in (db.reload_stats()["last_error"] or "") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = db.reload_stats()
+        assert stats["failed_reloads"] >= 1
+        assert "dosage" in stats["last_error"]
+        assert db.get_medicine_info("aspirin") is not None
+
+        _write_catalog(path, {"aspirin": {"conditions": ["headache"]},
+                              "naproxen": {"conditions": ["back pain"]}})
+        while db.get_medicine_info("naproxen") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert db.get_medicine_info("naproxen") is not None
+        assert db.reload_stats()["watching"]
+    finally:
+        db.stop_watching()
+
+def test_catalog_file_names_are_normalized(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({
+        "medicines": {"Aspirin": {"conditions": ["headache"], "dosage": {"adult": "300 mg"}}},
+        "categories": {"painkillers": ["Aspirin"]},
+    }))
+    db = MedicineDatabase(catalog_path=str(path))
+    assert db.get_medicine_info("Aspirin")["generic_name"] == "aspirin"
+    assert db.get_dosage_info("aspirin") == {"adult": "300 mg"}
+    assert db.get_medicine_categories("aspirin") == ["painkillers"]
+
+def test_failing_subscriber_does_not_fail_reload(tmp_path):
+    path = tmp_path / "catalog.json"
+    _write_catalog(path, {"aspirin": {"conditions": ["headache"]}})
+    db = MedicineDatabase(catalog_path=str(path))
+    seen = []
+
+    def broken(changes):
+        raise RuntimeError("subscriber down")
+    db.subscribe(broken)
+    db.subscribe(seen.append)
+
+    _write_catalog(path, {"naproxen": {"conditions": ["headache"]}})
+    assert db.reload()
+    db.delete_medicine("naproxen")
+    assert [[c["op"] for c in batch] for batch in seen] == [["put", "delete"], ["delete"]]
+    stats = db.reload_stats()
+    assert (stats["reloads"], stats["failed_reloads"], stats["last_error"]) == (1, 0, None)
+    assert stats["subscriber_errors"] == 2
+    assert "subscriber down" in stats["last_subscriber_error"]
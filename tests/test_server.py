@@ -0,0 +1,86 @@
+"""Test suite for the HTTP query service."""
+import http.client
+import json
+import threading
+import pytest
+from pharmatech import PharmaTech
+from pharmatech.server import serve
+
+@pytest.fixture
+def server():
+    server = serve(port=0, pharma=PharmaTech())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _connect(server):
+    return http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+
+def _get(conn, path, headers=None):
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    return response, json.loads(body) if body else None
+
+def test_queries_over_keep_alive_connection(server):
+    conn = _connect(server)
+    response, body = _get(conn, "/medicines/paracetamol")
+    assert response.status == 200
+    assert body == PharmaTech().get_medicine_details("paracetamol")
+    response, body = _get(conn, "/search/condition?q=fever")
+    assert "paracetamol" in [m["generic_name"] for m in body]
+    response, body = _get(conn, "/medicines/ibuprofen/pregnancy-safety")
+    assert body["category"] == "C"
+    response, body = _get(conn, "/medicines/nonexistentmedicine")
+    assert response.status == 404
+
+def test_conditional_get(server):
+    conn = _connect(server)
+    response, _ = _get(conn, "/categories")
+    etag = response.getheader("ETag")
+    response, _ = _get(conn, "/categories", {"If-None-Match": etag})
+    assert response.status == 304
+    response, _ = _get(conn, "/medicines/nonexistentmedicine", {"If-None-Match": etag})
+    assert response.status == 404
+    response, _ = _get(conn, "/no/such/route", {"If-None-Match": etag})
+    assert response.status == 404
+
+    server.pharma._db.add_medicine("aspirin", ["pain relief"], ["headache"], "Salicylate")
+    response, body = _get(conn, "/search/condition?q=headache", {"If-None-Match": etag})
+    assert response.status == 200
+    assert response.getheader("ETag") != etag
+    assert "aspirin" in [m["generic_name"] for m in body]
+
+def test_validate_doses(server):
+    conn = _connect(server)
+    conn.request("POST", "/validate-doses", body=json.dumps([["paracetamol", 500, 4]]))
+    response = conn.getresponse()
+    assert json.loads(response.read()) == ["ok"]
+    conn.request("POST", "/validate-doses", body=b'[["paracetamol", NaN, 4]]')
+    response = conn.getresponse()
+    assert json.loads(response.read()) == ["invalid_order"]
+    conn.request("POST", "/validate-doses", body=b"{bad")
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 400
+    conn.putrequest("POST", "/validate-doses")
+    conn.putheader("Content-Length", "abc")
+    conn.endheaders()
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 400
+
+def test_changes_endpoint(server):
+    conn = _connect(server)
+    _get(conn, "/medicines/paracetamol")
+    _get(conn, "/medicines/ibuprofen")
+    assert {"paracetamol", "ibuprofen"} <= set(server.cache._records)
+    server.pharma._db.update_medicine("paracetamol", description="Acetaminophen")
+    response, body = _get(conn, "/changes?since=0")
+    assert body["seq"] == 1
+    assert body["changes"][0]["generic_name"] == "paracetamol"
+    response, body = _get(conn, "/medicines/paracetamol")
+    assert body["description"] == "Acetaminophen"
+    assert "ibuprofen" in server.cache._records
@@ -0,0 +1,72 @@
+"""Test suite for database snapshots."""
+import json
+import time
+import pytest
+from pharmatech.medicine_db import MedicineDatabase, _catalog_fingerprint
+from pharmatech.snapshot import SnapshotError, read_snapshot, write_snapshot
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    db = MedicineDatabase()
+    db.save_snapshot(path)
+    loaded = MedicineDatabase.load_snapshot(path)
+    assert loaded.get_medicine_info("paracetamol") == db.get_medicine_info("paracetamol")
+    assert loaded.search_by_condition("fever") == db.search_by_condition("fever")
+    assert loaded.get_all_categories() == db.get_all_categories()
+
+def test_corrupt_snapshot_falls_back_to_rebuild(tmp_path):
+    path = tmp_path / "catalog.snap"
+    MedicineDatabase().save_snapshot(str(path))
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(str(path), _catalog_fingerprint())
+    db = MedicineDatabase.load_snapshot(str(path))
+    assert db.get_medicine_info("paracetamol") is not None
+
+def test_stale_snapshot_is_rejected(tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    write_snapshot(path, {"state": 1}, b"a" * 32)
+    with pytest.raises(SnapshotError, match="stale"):
+        read_snapshot(path, b"b" * 32)
+    assert read_snapshot(path, b"a" * 32) == {"state": 1}
+
+def test_missing_snapshot_falls_back_to_rebuild(tmp_path):
+    db = MedicineDatabase.load_snapshot(str(tmp_path / "missing.snap"))
+    assert len(db.search_by_condition("fever")) > 0
+
+def test_load_is_faster_than_rebuild(tmp_path):
+    sections = MedicineDatabase._builtin_catalog()
+    medicines = {f"{name}_{copy}": info for copy in range(30)
+                 for name, info in sections["medicines"].items()}
+    catalog = str(tmp_path / "catalog.json")
+    with open(catalog, "w") as handle:
+        json.dump({"medicines": medicines}, handle)
+    path = str(tmp_path / "catalog.snap")
+    MedicineDatabase(catalog).save_snapshot(path)
+
+    def best_of(build):
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            db = build()
+            timings.append(time.perf_counter() - start)
+        return min(timings), db
+
+    rebuild, built = best_of(lambda: MedicineDatabase(catalog))
+    load, loaded = best_of(lambda: MedicineDatabase.load_snapshot(path, catalog))
+    assert loaded.get_medicine_info("paracetamol_7") == built.get_medicine_info("paracetamol_7")
+    assert load < rebuild
+
+def test_snapshot_of_stale_catalog_is_not_loaded(tmp_path):
+    catalog = tmp_path / "catalog.json"
+    catalog.write_text(json.dumps({"medicines": {"aspirin": {"conditions": ["headache"]}}}))
+    db = MedicineDatabase(str(catalog))
+    # The file changes before the database reloads it, then gets snapshotted
+    catalog.write_text(json.dumps({"medicines": {"naproxen": {"conditions": ["headache"]}}}))
+    path = str(tmp_path / "catalog.snap")
+    db.save_snapshot(path)
+    loaded = MedicineDatabase.load_snapshot(path, str(catalog))
+    assert loaded.get_medicine_info("aspirin") is None
+    assert loaded.get_medicine_info("naproxen") is not None
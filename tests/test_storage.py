@@ -0,0 +1,80 @@
+"""Test suite for tiered record storage."""
+import json
+from pharmatech.medicine_db import MedicineDatabase
+from pharmatech.storage import BlockStore, RecordCache, TieredStorage, value_size
+
+def test_block_store_round_trip(tmp_path):
+    store = BlockStore(str(tmp_path))
+    first = store.put({"description": "a" * 1000})
+    second = store.put({"precautions": ["x", "y"]})
+    assert store.get(second) == {"precautions": ["x", "y"]}
+    assert store.get(first) == {"description": "a" * 1000}
+    assert store.size < 1000
+
+def test_record_cache_is_bounded():
+    cache = RecordCache(max_bytes=100)
+    for key in range(10):
+        cache.get(key, lambda: ("value", 30))
+    assert cache.bytes <= 100
+    assert cache.stats()["entries"] == 3
+
+def test_tiered_database_matches_in_memory(tmp_path):
+    plain = MedicineDatabase()
+    tiered = MedicineDatabase(tiered_storage=TieredStorage(str(tmp_path), cache_bytes=512))
+    for name in ["paracetamol", "ibuprofen", "folic_acid", "nonexistentmedicine"]:
+        assert tiered.get_medicine_info(name) == plain.get_medicine_info(name)
+        assert tiered.get_pregnancy_safety(name) == plain.get_pregnancy_safety(name)
+    assert tiered.search_by_condition("pain") == plain.search_by_condition("pain")
+    assert tiered.search_safe_in_lactation("safe") == plain.search_safe_in_lactation("safe")
+    stats = tiered.storage_stats()
+    assert stats["tiered"] and stats["cold_records"] > 0
+    assert stats["cache"]["bytes"] <= 512
+    assert "description" not in tiered._catalog.medicines["paracetamol"]
+
+def test_tiered_add_medicine_and_snapshot(tmp_path):
+    tiered = TieredStorage(str(tmp_path))
+    db = MedicineDatabase(tiered_storage=tiered)
+    db.add_medicine("aspirin", ["pain relief"], ["headache"], "Salicylate pain reliever")
+    assert db.get_medicine_info("aspirin")["description"] == "Salicylate pain reliever"
+
+    path = str(tmp_path / "catalog.snap")
+    db.save_snapshot(path)
+    loaded = MedicineDatabase.load_snapshot(path)
+    assert not loaded.storage_stats()["tiered"]
+    assert loaded.get_medicine_info("aspirin") == db.get_medicine_info("aspirin")
+    loaded = MedicineDatabase.load_snapshot(path, tiered_storage=tiered)
+    assert loaded.storage_stats()["tiered"]
+    assert loaded.get_medicine_info("paracetamol") == db.get_medicine_info("paracetamol")
+    assert loaded.get_medicine_info("aspirin") == db.get_medicine_info("aspirin")
+
+def test_tiered_snapshot_keeps_cold_fields_compressed(tmp_path):
+    db = MedicineDatabase(tiered_storage=TieredStorage(str(tmp_path)))
+    path = tmp_path / "catalog.snap"
+    db.save_snapshot(str(path))
+    # Stored as the compressed blocks, not pickled as text
+    assert b"Common pain reliever" not in path.read_bytes()
+    plain = MedicineDatabase()
+    plain.save_snapshot(str(path))
+    loaded = MedicineDatabase.load_snapshot(str(path), tiered_storage=TieredStorage(str(tmp_path)))
+    assert loaded.storage_stats()["cold_records"] > 0
+    assert loaded.get_medicine_info("paracetamol") == plain.get_medicine_info("paracetamol")
+
+def test_tiered_catalog_file_and_reload(tmp_path):
+    path = tmp_path / "catalog.json"
+    MedicineDatabase().export_catalog(str(path))
+    db = MedicineDatabase(str(path), tiered_storage=TieredStorage(str(tmp_path)))
+    assert "description" not in db._catalog.medicines["paracetamol"]
+    assert db.get_medicine_info("ibuprofen") == MedicineDatabase().get_medicine_info("ibuprofen")
+    cache = db.storage_stats()["cache"]
+    assert cache["bytes"] == value_size(db._catalog.cold_fields("ibuprofen"))
+
+    data = json.loads(path.read_text())
+    data["medicines"]["paracetamol"]["precautions"] = ["Do not combine with alcohol"]
+    path.write_text(json.dumps(data))
+    seen = []
+    db.subscribe(seen.append)
+    assert db.reload()
+    assert [(c["op"], c["generic_name"]) for c in seen[0]] == [("put", "paracetamol")]
+    assert seen[0][0]["record"]["precautions"] == ["Do not combine with alcohol"]
+    # Diffing the versions did not go through the new version's cache
+    assert db.storage_stats()["cache"] == dict(cache, entries=0, bytes=0, hits=0, misses=0)